@@ -1,6 +1,6 @@
 import xml.etree.ElementTree as ET
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 import os
 
 @dataclass
@@ -11,12 +11,47 @@ class Instrument:
     max_simultaneous_notes: int
     clef: str
     description: str
+    # Optional melodic constraints (see StochasticComposer.get_random_notes_for_instrument)
+    max_leap: Optional[int] = None  # Largest allowed interval between consecutive notes, in semitones
+    preferred_step: Optional[int] = None  # Interval size (semitones) that is drawn most often
+    tessitura_low: Optional[str] = None  # Comfortable range; notes outside it are less likely
+    tessitura_high: Optional[str] = None
 
 @dataclass
 class Ensemble:
     name: str
     instruments: List[Instrument]
 
+@dataclass
+class CaptureSettings:
+    width: int = 0  # 0 keeps the camera driver's default
+    height: int = 0
+    roi: Optional[Tuple[int, int, int, int]] = None  # x, y, width, height
+    channel: Optional[int] = None  # None converts BGR to grayscale
+    source: Optional[str] = None  # Video file or .npy frame array instead of the webcam
+
+# Named form plans; any string of section letters (e.g. "AABA") is accepted as well
+FORM_PLANS = {
+    "binary": "AB",
+    "ternary": "ABA",
+    "rondo": "ABACA",
+    "arch": "ABCBA",
+}
+
+@dataclass
+class FormSettings:
+    plan: str  # Section letters, e.g. "ABA"
+    cache_size: int = 8  # Sections kept per part for restatement
+    transpose: int = 0  # Restatements are transposed by up to this many semitones
+    vary_dynamics: bool = True  # Restatements get new dynamic levels
+
+@dataclass
+class HarmonySettings:
+    # See harmony.HarmonyFilter; chords must satisfy all given restrictions
+    set_classes: List[str] = field(default_factory=list)  # Names or prime forms, e.g. "triad", "0258"
+    scale: Optional[str] = None  # e.g. "C major", "D dorian"
+    forbidden_intervals: List[int] = field(default_factory=list)  # Interval classes 1-6
+
 @dataclass
 class MusicConfig:
     rhythms: List[str]
@@ -25,6 +60,68 @@ class MusicConfig:
     ensembles: Dict[str, Ensemble]
     num_measures_min: int
     num_measures_max: int
+    capture: CaptureSettings = field(default_factory=CaptureSettings)
+    form: Optional[FormSettings] = None
+    harmony: Optional[HarmonySettings] = None
+
+def parse_capture_settings(capture_elem):
+    """Parse the optional <capture> element for the webcam random generator."""
+    settings = CaptureSettings()
+    if capture_elem is None:
+        return settings
+    
+    settings.width = int(capture_elem.get('width', 0))
+    settings.height = int(capture_elem.get('height', 0))
+    
+    roi_str = capture_elem.get('roi')
+    if roi_str:
+        roi = tuple(int(value.strip()) for value in roi_str.split(','))
+        if len(roi) != 4:
+            raise ValueError(f"Capture roi must be 'x,y,width,height', got: {roi_str}")
+        if roi[0] < 0 or roi[1] < 0 or roi[2] <= 0 or roi[3] <= 0:
+            raise ValueError(f"Capture roi needs x,y >= 0 and width,height > 0, got: {roi_str}")
+        settings.roi = roi
+    
+    channel_str = capture_elem.get('channel')
+    if channel_str is not None and channel_str.strip().lower() not in ('', 'gray'):
+        settings.channel = int(channel_str)
+        if settings.channel not in (0, 1, 2):
+            raise ValueError(f"Capture channel must be 0 (B), 1 (G), 2 (R) or gray, got: {channel_str}")
+    
+    source = capture_elem.get('source')
+    if source:
+        settings.source = source
+    
+    return settings
+
+def parse_form_settings(form_elem):
+    """Parse the optional <form> element; returns None when pieces are through-composed."""
+    if form_elem is None or not form_elem.get('plan'):
+        return None
+    
+    plan = form_elem.get('plan').strip()
+    plan = FORM_PLANS.get(plan.lower(), plan).upper()
+    if not plan.isalpha():
+        raise ValueError(f"Form plan must be a name ({', '.join(FORM_PLANS)}) or section letters, got: {plan}")
+    
+    return FormSettings(
+        plan=plan,
+        cache_size=int(form_elem.get('cacheSize', 8)),
+        transpose=int(form_elem.get('transpose', 0)),
+        vary_dynamics=form_elem.get('varyDynamics', 'true').strip().lower() in ('true', '1', 'yes'),
+    )
+
+def parse_harmony_settings(harmony_elem):
+    """Parse the optional <harmony> element; returns None when chords are unrestricted."""
+    if harmony_elem is None:
+        return None
+    
+    set_classes = [value.strip() for value in harmony_elem.get('setClasses', '').split(',') if value.strip()]
+    scale = harmony_elem.get('scale', '').strip() or None
+    forbidden = [int(value) for value in harmony_elem.get('forbiddenIntervals', '').split(',') if value.strip()]
+    if not set_classes and scale is None and not forbidden:
+        return None
+    return HarmonySettings(set_classes, scale, forbidden)
 
 def parse_config(config_path="config/config.xml"):
     """Parse the XML configuration file and return a MusicConfig object."""
@@ -86,8 +183,27 @@ def parse_config(config_path="config/config.xml"):
                 range_low, range_high = range_str.split('-')
                 
                 instrument = Instrument(name, range_low, range_high, max_notes, clef_name, description)
+                
+                # Parse optional melodic constraints
+                if instrument_elem.get('maxLeap'):
+                    instrument.max_leap = int(instrument_elem.get('maxLeap'))
+                if instrument_elem.get('preferredStep'):
+                    instrument.preferred_step = int(instrument_elem.get('preferredStep'))
+                tessitura_str = instrument_elem.get('tessitura')
+                if tessitura_str:
+                    instrument.tessitura_low, instrument.tessitura_high = tessitura_str.split('-')
                 instruments.append(instrument)
             
             ensembles[ensemble_name] = Ensemble(ensemble_name, instruments)
     
-    return MusicConfig(rhythms, dynamics, articulations, ensembles, num_measures_min, num_measures_max)
\ No newline at end of file
+    # Parse webcam capture settings
+    capture = parse_capture_settings(root.find('capture'))
+    
+    # Parse form plan
+    form = parse_form_settings(root.find('form'))
+    
+    # Parse chord restrictions
+    harmony = parse_harmony_settings(root.find('harmony'))
+    
+    return MusicConfig(rhythms, dynamics, articulations, ensembles, num_measures_min, num_measures_max, capture, form,
+                       harmony)
\ No newline at end of file
@@ -1,15 +1,38 @@
 import cv2
 import numpy as np
 import hashlib
+import glob
+import os
+import sys
 import struct
 import time
+import threading
+from contextlib import contextmanager
 
 class WebcamRandomGenerator:
-    def __init__(self):
+    def __init__(self, capture_settings=None):
         self.camera = None
         self.last_frame = None
         self.random_pool = []
         self.pool_index = 0
+        # Frame size, region of interest and channel (config_parser.CaptureSettings)
+        self.capture_settings = capture_settings
+        self._frame_grabbed = False
+        # Whether the ROI was checked against the source's frame size (see check_frame_settings)
+        self._frame_checked = False
+        # Extra pause before grabbing the next frame. grab() already blocks until the driver
+        # delivers a new frame, so compared frames are at least one frame period apart without it
+        self.frame_interval = 0
+        # Serializes pool access when several threads share one generator
+        self._lock = threading.RLock()
+        self._camera_lock = threading.Lock()
+        # Optional background refill (see start_background_refill)
+        self._spare_pool = None
+        self._refill_thread = None
+        self._refill_needed = threading.Event()
+        self._refill_stop = threading.Event()
+        self._refill_pool_size = 100
+        self._refill_low_water = 0.5
         
     def __enter__(self):
         self.open_camera()
@@ -24,93 +47,376 @@ class WebcamRandomGenerator:
             self.camera = cv2.VideoCapture(0)
             if not self.camera.isOpened():
                 raise RuntimeError("Camera could not be opened.")
+            
+            # Request a smaller frame from the driver if configured
+            settings = self.capture_settings
+            if settings is not None and settings.width and settings.height:
+                self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, settings.width)
+                self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.height)
+            
             # First frame for initialization
             time.sleep(0.1)  # Wait briefly until camera is ready
-            ret, frame = self.camera.read()
-            if ret:
-                self.last_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            self._frame_grabbed = self.camera.grab()
+            if self._frame_grabbed:
+                self._capture_first_frame()
+    
+    def _capture_first_frame(self):
+        """Reads the first frame, checking the capture settings against it."""
+        self._frame_checked = False
+        try:
+            self.last_frame = self.capture_frame()
+        except ValueError:
+            self.close_camera()
+            raise
     
     def close_camera(self):
         """Closes the camera."""
+        self.stop_background_refill()
         if self.camera is not None:
             self.camera.release()
             self.camera = None
+            self._frame_grabbed = False
+    
+    def check_frame_settings(self, frame):
+        """Raises a ValueError when the configured region of interest lies outside the frame."""
+        settings = self.capture_settings
+        if settings is not None and settings.roi is not None:
+            x, y, width, height = settings.roi
+            frame_height, frame_width = frame.shape[:2]
+            if x >= frame_width or y >= frame_height:
+                raise ValueError(f"Capture roi {settings.roi} lies outside the {frame_width}x{frame_height} frame; "
+                                 f"adjust roi (or width/height) in the <capture> config.")
+        self._frame_checked = True
+    
+    def prepare_frame(self, frame):
+        """Reduces a BGR frame to the configured region of interest and a single channel."""
+        if not self._frame_checked:
+            self.check_frame_settings(frame)
+        settings = self.capture_settings
+        if settings is not None and settings.roi is not None:
+            x, y, width, height = settings.roi
+            frame = frame[y:y + height, x:x + width]
+        
+        if settings is not None and settings.channel is not None and frame.ndim == 3:
+            # Slicing one channel is much cheaper than a full color conversion
+            return np.ascontiguousarray(frame[:, :, settings.channel])
+        if frame.ndim == 3:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame
     
     def capture_frame(self):
         """Captures a single image."""
         if self.camera is None:
             raise RuntimeError("Camera is not open.")
         
-        ret, frame = self.camera.read()
+        # Decode the frame grabbed at the end of the previous call, then grab the next one.
+        # Both calls run on this thread, so capturing does not overlap with diffing and hashing;
+        # grab() blocks until the driver has a new frame
+        if not self._frame_grabbed and not self.camera.grab():
+            raise RuntimeError("Camera image could not be captured.")
+        ret, frame = self.camera.retrieve()
+        if self.frame_interval:
+            # Space the grabbed frames (the ones that are compared), not the hashing
+            time.sleep(self.frame_interval)
+        self._frame_grabbed = self.camera.grab()
         if not ret:
             raise RuntimeError("Camera image could not be captured.")
-        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return self.prepare_frame(frame)
+    
+    def _collect_pool_values(self, pool_size):
+        """Captures frames and turns their differences into random numbers."""
+        values = []
+        
+        with self._camera_lock:
+            for _ in range(pool_size):
+                current_frame = self.capture_frame()
+                
+                if self.last_frame is not None:
+                    # Difference between current and last frame
+                    noise = cv2.absdiff(current_frame, self.last_frame)
+                    
+                    # Generate hash
+                    image_bytes = noise.tobytes()
+                    hash_bytes = hashlib.sha256(image_bytes).digest()
+                    
+                    # Convert 4 bytes to uint32
+                    rand_int = struct.unpack("I", hash_bytes[:4])[0]
+                    values.append(rand_int)
+                
+                self.last_frame = current_frame
+        
+        return values
     
     def generate_random_pool(self, pool_size=50):
         """Generates a pool of random numbers from multiple camera images."""
         if self.camera is None:
             self.open_camera()
         
-        self.random_pool = []
+        values = self._collect_pool_values(pool_size)
         
-        for _ in range(pool_size):
-            # Wait briefly for image change
-            time.sleep(0.01)  # 10ms should be enough
-            
-            current_frame = self.capture_frame()
+        with self._lock:
+            self.random_pool = values
+            self.pool_index = 0
+        print(f"Random pool with {len(self.random_pool)} values generated.")
+    
+    def start_background_refill(self, pool_size=100, low_water=0.5):
+        """Keeps a spare pool ready in a background thread so callers never wait for the camera."""
+        if self._refill_thread is not None:
+            return
+        if self.camera is None:
+            self.open_camera()
+        
+        self._refill_pool_size = pool_size
+        self._refill_low_water = low_water
+        self._refill_stop.clear()
+        self._refill_needed.set()
+        self._refill_thread = threading.Thread(target=self._refill_loop, name="entropy-refill", daemon=True)
+        self._refill_thread.start()
+    
+    def stop_background_refill(self):
+        """Stops the background refill thread if it is running."""
+        if self._refill_thread is None:
+            return
+        self._refill_stop.set()
+        self._refill_needed.set()
+        self._refill_thread.join()
+        self._refill_thread = None
+    
+    def _refill_loop(self):
+        """Background thread: fills the spare pool whenever the active pool runs low."""
+        while True:
+            self._refill_needed.wait()
+            if self._refill_stop.is_set():
+                break
+            self._refill_needed.clear()
+            if self._spare_pool:
+                continue
             
-            if self.last_frame is not None:
-                # Difference between current and last frame
-                noise = cv2.absdiff(current_frame, self.last_frame)
-                
-                # Generate hash
-                image_bytes = noise.tobytes()
-                hash_bytes = hashlib.sha256(image_bytes).digest()
-                
-                # Convert 4 bytes to uint32
-                rand_int = struct.unpack("I", hash_bytes[:4])[0]
-                self.random_pool.append(rand_int)
+            try:
+                values = self._collect_pool_values(self._refill_pool_size)
+            except RuntimeError as e:
+                print(f"Background entropy refill failed: {e}")
+                continue
             
-            self.last_frame = current_frame
-        
-        self.pool_index = 0
-        print(f"Random pool with {len(self.random_pool)} values generated.")
+            with self._lock:
+                self._spare_pool = values
     
     def get_random_from_pool(self, start, end):
         """Gets a random number from the pool."""
         if start >= end:
             raise ValueError("Start value must be less than end value.")
         
-        # If pool is empty or exhausted, regenerate
-        if not self.random_pool or self.pool_index >= len(self.random_pool):
-            self.generate_random_pool()
-        
-        # Get number from pool
-        rand_int = self.random_pool[self.pool_index]
-        self.pool_index += 1
+        with self._lock:
+            # If pool is empty or exhausted, swap in the spare pool or regenerate
+            if not self.random_pool or self.pool_index >= len(self.random_pool):
+                if self._spare_pool:
+                    self.random_pool = self._spare_pool
+                    self._spare_pool = None
+                    self.pool_index = 0
+                else:
+                    self.generate_random_pool()
+            
+            # Get number from pool
+            rand_int = self.random_pool[self.pool_index]
+            self.pool_index += 1
+            
+            # Ask the refill thread for a spare pool once the active one runs low
+            if (self._refill_thread is not None and self._spare_pool is None
+                    and self.pool_index >= len(self.random_pool) * self._refill_low_water):
+                self._refill_needed.set()
         
         # Scale range
         range_size = end - start + 1
         return start + (rand_int % range_size)
 
+class VideoFileRandomGenerator(WebcamRandomGenerator):
+    """Runs the frame diff/hash pipeline on a recorded video file instead of the webcam."""
+    
+    def __init__(self, video_path, capture_settings=None, loop=True):
+        super().__init__(capture_settings)
+        self.video_path = video_path
+        self.loop = loop
+        self.frame_interval = 0  # Frames are already recorded, no need to wait
+    
+    def open_camera(self):
+        """Opens the video file."""
+        if self.camera is None:
+            self.camera = cv2.VideoCapture(self.video_path)
+            if not self.camera.isOpened():
+                self.camera = None
+                raise RuntimeError(f"Video file could not be opened: {self.video_path}")
+            self._frame_grabbed = self.camera.grab()
+            if self._frame_grabbed:
+                self._capture_first_frame()
+    
+    def capture_frame(self):
+        """Reads the next frame, starting over at the end of the file if looping."""
+        if self.camera is None:
+            raise RuntimeError("Video file is not open.")
+        
+        if not self._frame_grabbed and self.loop:
+            self.camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self._frame_grabbed = self.camera.grab()
+        if not self._frame_grabbed:
+            raise RuntimeError(f"No more frames in video file: {self.video_path}")
+        return super().capture_frame()
+
+class FrameArrayRandomGenerator(WebcamRandomGenerator):
+    """Runs the frame diff/hash pipeline on frames stored in one memory-mapped .npy file."""
+    
+    def __init__(self, npy_path, capture_settings=None, loop=True):
+        super().__init__(capture_settings)
+        self.npy_path = npy_path
+        self.loop = loop
+        self.frame_interval = 0  # Frames are already recorded, no need to wait
+        self.frame_index = 0
+    
+    def open_camera(self):
+        """Memory-maps the frame array; frames are only read from disk when used."""
+        if self.camera is None:
+            frames = np.load(self.npy_path, mmap_mode='r')
+            if frames.ndim not in (3, 4) or len(frames) < 2:
+                raise RuntimeError(f"Expected an array of at least 2 frames (N,H,W[,C]) in {self.npy_path}, "
+                                   f"got shape {frames.shape}")
+            self.camera = frames
+            self.frame_index = 0
+            self._capture_first_frame()
+    
+    def close_camera(self):
+        """Releases the memory map."""
+        self.stop_background_refill()
+        self.camera = None
+    
+    def capture_frame(self):
+        """Returns the next stored frame, reduced to the configured ROI and channel."""
+        if self.camera is None:
+            raise RuntimeError("Frame array is not open.")
+        
+        if self.frame_index >= len(self.camera):
+            if not self.loop:
+                raise RuntimeError(f"No more frames in {self.npy_path}")
+            self.frame_index = 0
+        frame = self.camera[self.frame_index]
+        self.frame_index += 1
+        return np.ascontiguousarray(self.prepare_frame(frame))
+
+def pack_frames_to_npy(frames_dir, npy_path, patterns=("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff")):
+    """Packs a directory of image frames (sorted by file name) into a single .npy file."""
+    paths = sorted(path for pattern in patterns for path in glob.glob(os.path.join(frames_dir, pattern)))
+    if not paths:
+        raise FileNotFoundError(f"No image frames found in {frames_dir}")
+    
+    first = cv2.imread(paths[0], cv2.IMREAD_UNCHANGED)
+    # Written frame by frame so the whole recording never has to fit in memory
+    frames = np.lib.format.open_memmap(npy_path, mode='w+', dtype=first.dtype, shape=(len(paths),) + first.shape)
+    for index, path in enumerate(paths):
+        frame = first if index == 0 else cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if frame is None or frame.shape != first.shape:
+            raise ValueError(f"Frame {path} could not be read or has a different size than {paths[0]}")
+        frames[index] = frame
+    frames.flush()
+    print(f"Packed {len(paths)} frames into {npy_path}")
+    return npy_path
+
+def create_random_generator(source=None, capture_settings=None):
+    """Creates a generator for the webcam (source=None), a .npy frame array or a video file."""
+    if source is None:
+        return WebcamRandomGenerator(capture_settings)
+    if str(source).lower().endswith('.npy'):
+        return FrameArrayRandomGenerator(source, capture_settings)
+    return VideoFileRandomGenerator(source, capture_settings)
+
+def benchmark_entropy_source(source=None, pool_size=1000, capture_settings=None):
+    """Measures how many random values per second the diff/hash pipeline extracts from a source."""
+    generator = create_random_generator(source, capture_settings)
+    generator.open_camera()
+    try:
+        start = time.perf_counter()
+        values = generator._collect_pool_values(pool_size)
+        elapsed = time.perf_counter() - start
+    finally:
+        generator.close_camera()
+    
+    rate = len(values) / elapsed if elapsed > 0 else float('inf')
+    print(f"{len(values)} values in {elapsed:.3f}s ({rate:.1f} values/s) from {source or 'webcam'}")
+    return rate
+
+class SeededRandomGenerator:
+    """Deterministic random stream with the same interface as the webcam pool."""
+    
+    def __init__(self, seed):
+        # seed may be an int or a numpy SeedSequence (see spawn_random_substreams)
+        self.rng = np.random.default_rng(seed)
+    
+    def get_random_from_pool(self, start, end):
+        """Gets a random number between start and end (inclusive)."""
+        if start >= end:
+            raise ValueError("Start value must be less than end value.")
+        return int(self.rng.integers(start, end + 1))
+    
+    def close_camera(self):
+        """Nothing to close; kept for compatibility with the webcam generators."""
+
+def spawn_random_substreams(seed, count):
+    """Derives count independent, reproducible random streams from one seed."""
+    return [SeededRandomGenerator(child) for child in np.random.SeedSequence(seed).spawn(count)]
+
+# Per-thread override of the global generator (see use_random_generator)
+_thread_state = threading.local()
+
+@contextmanager
+def use_random_generator(generator):
+    """Routes get_random_number calls made on the current thread to generator."""
+    previous = getattr(_thread_state, 'generator', None)
+    _thread_state.generator = generator
+    try:
+        yield generator
+    finally:
+        _thread_state.generator = previous
+
 # Global generator
 _global_generator = None
+_capture_settings = None
+
+def configure_random_generator(capture_settings):
+    """Sets the capture settings (and entropy source) used when the global generator is created."""
+    global _capture_settings
+    _capture_settings = capture_settings
+
+def _create_global_generator(capture_settings=None):
+    """Creates the global generator from the configured capture settings and source."""
+    settings = capture_settings or _capture_settings
+    source = settings.source if settings is not None else None
+    generator = create_random_generator(source, settings)
+    generator.open_camera()
+    return generator
 
 def get_random_number(start, end):
     """Simplified function for compatibility with existing code."""
     global _global_generator
     
+    generator = getattr(_thread_state, 'generator', None)
+    if generator is not None:
+        return generator.get_random_from_pool(start, end)
+    
     if _global_generator is None:
-        _global_generator = WebcamRandomGenerator()
-        _global_generator.open_camera()
+        _global_generator = _create_global_generator()
     
     return _global_generator.get_random_from_pool(start, end)
 
-def initialize_random_generator():
+def get_random_generator():
+    """Returns the global generator, opening the camera if necessary."""
+    global _global_generator
+    
+    if _global_generator is None:
+        _global_generator = _create_global_generator()
+    
+    return _global_generator
+
+def initialize_random_generator(capture_settings=None):
     """Initializes the generator and creates a first pool."""
     global _global_generator
-    _global_generator = WebcamRandomGenerator()
-    _global_generator.open_camera()
+    _global_generator = _create_global_generator(capture_settings)
     _global_generator.generate_random_pool(100)  # Large pool for many random numbers
     print("Webcam random generator initialized.")
 
@@ -129,6 +435,14 @@ def webcam_random_session():
 
 # Example usage:
 if __name__ == "__main__":
+    # Benchmark mode: python -m aleatoric.custom_random <video file | frames.npy | frames directory>
+    if len(sys.argv) > 1:
+        source = sys.argv[1]
+        if os.path.isdir(source):
+            source = pack_frames_to_npy(source, os.path.join(source, "frames.npy"))
+        benchmark_entropy_source(source)
+        sys.exit(0)
+    
     # Option 1: Automatic (as before)
     print("=== Automatic Usage ===")
     for i in range(10):
@@ -0,0 +1,159 @@
+import threading
+import zlib
+
+import numpy as np
+from music21 import chord, note
+
+from .score_features import extract_score_features
+
+# Smallest prime above 2**32, modulus of the universal hash family (a * x + b) mod p
+_HASH_PRIME = np.uint64(4294967311)
+
+
+def score_shingles(score, ngram=4):
+    """
+    Hash every n-gram of (pitch interval, duration) tokens of each part to a 32-bit value.
+    Intervals use the top note of chords, so transposed restatements produce the same shingles.
+    """
+    shingles = set()
+    for part in score.parts:
+        tokens = []
+        previous = None
+        for element in part.recurse().notesAndRests:
+            duration = float(element.quarterLength)
+            if isinstance(element, note.Rest):
+                tokens.append(f"r{duration}")
+                continue
+            top = max(p.midi for p in element.pitches) if isinstance(element, chord.Chord) else element.pitch.midi
+            interval = 0 if previous is None else top - previous
+            tokens.append(f"{interval}:{duration}:{len(element.pitches)}")
+            previous = top
+
+        for start in range(max(len(tokens) - ngram + 1, 1)):
+            gram = "|".join(tokens[start:start + ngram])
+            if gram:
+                shingles.add(zlib.crc32(gram.encode("utf-8")))
+    return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+
+class DuplicateIndex:
+    """
+    MinHash signatures of generated pieces with an LSH band index, for sub-linear
+    "has something like this been generated already?" queries.
+    """
+
+    def __init__(self, num_perm=128, bands=32, threshold=0.8, ngram=4, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.ngram = ngram
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=(num_perm, 1), dtype=np.uint64)
+
+        self._ids = []
+        self._signatures = []
+        self._buckets = [dict() for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def signature(self, score):
+        """MinHash signature of a score (num_perm uint32 values)."""
+        shingles = score_shingles(score, self.ngram)
+        if len(shingles) == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        # All permutations at once: (num_perm, 1) against (num_shingles,) -> minimum per row
+        hashed = (self._a * shingles % _HASH_PRIME + self._b) % _HASH_PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, piece_id, signature):
+        """Add a piece's signature to the index."""
+        with self._lock:
+            position = len(self._ids)
+            self._ids.append(piece_id)
+            self._signatures.append(signature)
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(position)
+
+    def query(self, signature, threshold=None):
+        """Pieces whose estimated similarity (Jaccard) to signature is at least threshold, best first."""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+            if not candidates:
+                return []
+            positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = (np.stack([self._signatures[i] for i in positions]) == signature).mean(axis=1)
+            ids = [self._ids[i] for i in positions]
+
+        matches = [(ids[i], float(similarities[i])) for i in np.argsort(-similarities) if similarities[i] >= threshold]
+        return matches
+
+    def find_duplicate(self, signature, threshold=None):
+        """The most similar indexed piece above the threshold, or None."""
+        matches = self.query(signature, threshold)
+        return matches[0] if matches else None
+
+    def save(self, path):
+        """Save parameters and signatures; the band buckets are rebuilt on load."""
+        with self._lock:
+            signatures = np.stack(self._signatures) if self._signatures else np.zeros((0, self.num_perm), np.uint32)
+            np.savez(path, ids=np.array(self._ids, dtype=np.int64), signatures=signatures,
+                     params=np.array([self.num_perm, self.bands, self.ngram, self.seed], dtype=np.int64),
+                     threshold=np.array(self.threshold))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            num_perm, bands, ngram, seed = (int(value) for value in data["params"])
+            index = cls(num_perm, bands, float(data["threshold"]), ngram, seed)
+            for piece_id, signature in zip(data["ids"].tolist(), data["signatures"]):
+                index.add(piece_id, signature)
+        return index
+
+
+def _attempt_seed(seed, attempt):
+    """Seed for the n-th attempt: the original seed first, then reproducible derived seeds."""
+    if attempt == 0:
+        return seed
+    return int(np.random.SeedSequence([seed, attempt]).generate_state(1)[0])
+
+
+def compose_unique_score(composer, index, ensemble_name="Piano Solo", num_measures=None,
+                         title="Aleatoric Music", seed=None, max_attempts=5):
+    """
+    Compose a score, regenerating it while it is a near-duplicate of an indexed piece.
+    Returns (score, signature, seed); add the signature to the index once the piece is stored.
+    After max_attempts the last attempt is returned even if it is a near-duplicate.
+    """
+    # Only the accepted attempt should reach the composer's feature store
+    feature_writer, composer.feature_writer = composer.feature_writer, None
+    try:
+        for attempt in range(max_attempts):
+            attempt_seed = _attempt_seed(seed, attempt) if seed is not None else None
+            score = composer.create_random_score(ensemble_name, num_measures, title, seed=attempt_seed)
+            signature = index.signature(score)
+            duplicate = index.find_duplicate(signature)
+            if duplicate is None:
+                break
+            print(f"Near-duplicate of piece {duplicate[0]} (similarity {duplicate[1]:.2f}), regenerating...")
+        else:
+            print(f"No unique piece after {max_attempts} attempts, keeping the last one.")
+    finally:
+        composer.feature_writer = feature_writer
+
+    if feature_writer is not None:
+        feature_writer.add(extract_score_features(score, composer.config.ensembles[ensemble_name], attempt_seed))
+    return score, signature, attempt_seed
@@ -0,0 +1,39 @@
+from collections import OrderedDict
+
+
+def plan_sections(plan, num_measures):
+    """Split num_measures over the sections of a form plan: [(letter, length), ...]."""
+    base, extra = divmod(num_measures, len(plan))
+    return [(letter, base + (1 if index < extra else 0)) for index, letter in enumerate(plan)]
+
+
+class MotifLibrary:
+    """
+    Bounded cache of the sections generated for one part, keyed by section letter.
+    When it is full the least recently used section is dropped and regenerated if it returns.
+    """
+
+    def __init__(self, max_sections=8):
+        self.max_sections = max_sections
+        self._sections = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._sections)
+
+    def get(self, letter):
+        """The measure groups of a section, or None if it was never generated or was evicted."""
+        section = self._sections.get(letter)
+        if section is None:
+            self.misses += 1
+            return None
+        self._sections.move_to_end(letter)
+        self.hits += 1
+        return section
+
+    def put(self, letter, section):
+        self._sections[letter] = section
+        self._sections.move_to_end(letter)
+        while len(self._sections) > self.max_sections:
+            self._sections.popitem(last=False)
@@ -0,0 +1,396 @@
+import argparse
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from .stochastic_composer import StochasticComposer
+from .score_exporter import score_to_musicxml_bytes, score_to_midi_bytes
+from .custom_random import initialize_random_generator, cleanup_random_generator, get_random_generator, get_random_number
+
+# Supported output formats: name -> (content type, serializer)
+EXPORT_FORMATS = {
+    "musicxml": ("application/vnd.recordare.musicxml+xml", score_to_musicxml_bytes),
+    "midi": ("audio/midi", score_to_midi_bytes),
+}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ServiceBusy(Exception):
+    """Raised when the request queue is full or a request waited too long for a composer."""
+
+
+class ComposerPool:
+    """Keeps warm StochasticComposer instances and hands them out one request at a time."""
+
+    def __init__(self, config_path="config/config.xml", size=2, max_queue=32, queue_timeout=30.0):
+        self.config_path = config_path
+        self.size = size
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._config_mtime = os.path.getmtime(config_path)
+        self._config_version = 0
+        self._composer_versions = {}
+
+        for _ in range(size):
+            composer = StochasticComposer(config_path)
+            self._composer_versions[id(composer)] = self._config_version
+            self._idle.put(composer)
+
+    @property
+    def waiting(self):
+        """Number of requests currently queued for a composer."""
+        return self._waiting
+
+    @property
+    def idle(self):
+        """Number of composers not serving a request."""
+        return self._idle.qsize()
+
+    def _check_config(self):
+        """Bump the config version when the XML file changed on disk."""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return
+        with self._lock:
+            if mtime != self._config_mtime:
+                self._config_mtime = mtime
+                self._config_version += 1
+                print(f"Config change detected: {self.config_path} (version {self._config_version})")
+
+    def acquire(self):
+        """Wait for an idle composer, reloading its config first if the file changed."""
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise ServiceBusy(f"Request queue is full ({self.max_queue} waiting).")
+            self._waiting += 1
+        try:
+            composer = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise ServiceBusy(f"No composer became available within {self.queue_timeout}s.")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        self._check_config()
+        version = self._config_version
+        if self._composer_versions.get(id(composer)) != version:
+            try:
+                composer.reload_config()
+            except Exception as e:
+                # Keep serving the last good config while the file is being edited
+                print(f"Config reload failed, keeping previous config: {e}")
+            self._composer_versions[id(composer)] = version
+        return composer
+
+    def release(self, composer):
+        """Return a composer to the pool."""
+        self._idle.put(composer)
+
+
+class LatencyMetrics:
+    """Per-request latency bookkeeping over a sliding window of recent requests."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.samples = {
+            "queue_ms": deque(maxlen=window),
+            "generate_ms": deque(maxlen=window),
+            "export_ms": deque(maxlen=window),
+            "total_ms": deque(maxlen=window),
+        }
+
+    def record(self, **timings):
+        with self._lock:
+            self.completed += 1
+            for key, value in timings.items():
+                self.samples[key].append(value)
+
+    def record_failure(self, rejected=False):
+        with self._lock:
+            if rejected:
+                self.rejected += 1
+            else:
+                self.failed += 1
+
+    @staticmethod
+    def _summarize(values):
+        if not values:
+            return {"count": 0}
+        ordered = sorted(values)
+
+        def percentile(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+        return {
+            "count": len(ordered),
+            "mean": round(sum(ordered) / len(ordered), 2),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "max": round(ordered[-1], 2),
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "latency": {key: self._summarize(values) for key, values in self.samples.items()},
+            }
+
+
+class GenerationService:
+    """Turns generation requests into exported score bytes using a warm composer pool."""
+
+    def __init__(self, pool, metrics=None):
+        self.pool = pool
+        self.metrics = metrics or LatencyMetrics()
+
+    def generate(self, ensemble="Piano Solo", measures=None, title="Aleatoric Music", formats=("musicxml",), seed=None):
+        """
+        Compose one score and return ({format: bytes}, timings in ms, seed).
+        Without a seed, a single number is taken from the entropy pool as the seed, so a
+        request never waits for the camera to refill the pool.
+        """
+        unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown format(s) {unknown}. Available: {list(EXPORT_FORMATS)}")
+        if measures is not None and measures < 1:
+            raise ValueError(f"measures must be at least 1, got: {measures}")
+        if seed is None:
+            seed = get_random_number(0, 2**32 - 1)
+
+        start = time.perf_counter()
+        composer = self.pool.acquire()
+        acquired = time.perf_counter()
+        try:
+            score = composer.create_random_score(ensemble, measures, title, seed=seed)
+        finally:
+            self.pool.release(composer)
+        generated = time.perf_counter()
+
+        # Exporting does not need the composer, so it runs outside the pool slot
+        outputs = {fmt: EXPORT_FORMATS[fmt][1](score) for fmt in formats}
+        exported = time.perf_counter()
+
+        timings = {
+            "queue_ms": (acquired - start) * 1000,
+            "generate_ms": (generated - acquired) * 1000,
+            "export_ms": (exported - generated) * 1000,
+            "total_ms": (exported - start) * 1000,
+        }
+        self.metrics.record(**timings)
+        return outputs, timings, seed
+
+    def status(self):
+        """Queue and pool state plus latency metrics."""
+        status = self.metrics.snapshot()
+        status["pool"] = {
+            "size": self.pool.size,
+            "idle": self.pool.idle,
+            "waiting": self.pool.waiting,
+            "max_queue": self.pool.max_queue,
+            "config_version": self.pool._config_version,
+        }
+        return status
+
+
+def _parse_formats(value):
+    """Accept a list, a comma separated string or a single format name."""
+    if value is None:
+        return ["musicxml"]
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(fmt, str) for fmt in value):
+        raise ValueError(f"formats must be a string or a list of strings, got: {value!r}")
+    return [fmt.strip().lower() for fmt in value if fmt.strip()]
+
+
+def _parse_int(params, key):
+    """An optional integer parameter; query strings deliver numbers as text."""
+    value = params.get(key)
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{key} must be an integer, got: {value!r}")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be an integer, got: {value!r}")
+
+
+def _parse_string(params, key, default):
+    value = params.get(key, default)
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string, got: {value!r}")
+    return value
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end: POST/GET /generate, GET /metrics, GET /health."""
+
+    protocol_version = "HTTP/1.1"
+    service = None  # Set by serve()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif url.path == "/metrics":
+            self._send_json(200, self.service.status())
+        elif url.path == "/generate":
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._handle_generate(params)
+        else:
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/generate":
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            self._send_json(400, {"error": f"Invalid Content-Length: {self.headers.get('Content-Length')}"})
+            return
+        if length < 0:
+            self._send_json(400, {"error": f"Invalid Content-Length: {length}"})
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+            return
+        if not isinstance(params, dict):
+            self._send_json(400, {"error": "JSON body must be an object"})
+            return
+        self._handle_generate(params)
+
+    def _handle_generate(self, params):
+        try:
+            measures = _parse_int(params, "measures")
+            formats = _parse_formats(params.get("formats", params.get("format")))
+            seed = _parse_int(params, "seed")
+            outputs, timings, seed = self.service.generate(
+                ensemble=_parse_string(params, "ensemble", "Piano Solo"),
+                measures=measures,
+                title=_parse_string(params, "title", "Aleatoric Music"),
+                formats=formats,
+                seed=seed,
+            )
+        except ServiceBusy as e:
+            self.service.metrics.record_failure(rejected=True)
+            self._send_json(503, {"error": str(e)})
+            return
+        except ValueError as e:
+            self.service.metrics.record_failure()
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.service.metrics.record_failure()
+            self._send_json(500, {"error": f"Generation failed: {e}"})
+            return
+
+        if len(formats) == 1:
+            content_type = EXPORT_FORMATS[formats[0]][0]
+            body = outputs[formats[0]]
+        else:
+            # Several formats in one response: base64 encoded inside a JSON document
+            content_type = "application/json"
+            body = json.dumps({
+                "formats": {fmt: base64.b64encode(data).decode("ascii") for fmt, data in outputs.items()},
+            }).encode("utf-8")
+
+        headers = {f"X-{key.replace('_ms', '').title()}-Time-Ms": f"{value:.2f}" for key, value in timings.items()}
+        headers["X-Seed"] = str(seed)  # Requesting the same seed again reproduces the score
+        if _parse_bool(params.get("stream", False)):
+            self._send_chunked(200, content_type, body, headers)
+        else:
+            self._send_bytes(200, content_type, body, headers)
+
+    def _send_bytes(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        for start in range(0, len(body), STREAM_CHUNK_SIZE):
+            chunk = body[start:start + STREAM_CHUNK_SIZE]
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status, payload):
+        self._send_bytes(status, "application/json", json.dumps(payload).encode("utf-8"))
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}")
+
+
+def serve(host="127.0.0.1", port=8000, config_path="config/config.xml", workers=2, max_queue=32, queue_timeout=30.0):
+    """Run the generation service until interrupted."""
+    pool = ComposerPool(config_path, size=workers, max_queue=max_queue, queue_timeout=queue_timeout)
+    # Open the entropy source once (with the config's capture settings); every request draws from it
+    initialize_random_generator()
+    # Requests only take their seed from the pool; refilling it happens off the request path
+    get_random_generator().start_background_refill()
+    GenerationRequestHandler.service = GenerationService(pool)
+    server = ThreadingHTTPServer((host, port), GenerationRequestHandler)
+    server.daemon_threads = True
+    print(f"Generation service listening on http://{host}:{port} ({workers} composers, queue limit {max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down generation service...")
+    finally:
+        server.server_close()
+        cleanup_random_generator()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service for stochastic score generation.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--config", default="config/config.xml")
+    parser.add_argument("--workers", type=int, default=2, help="Number of warm composers (concurrency limit)")
+    parser.add_argument("--max-queue", type=int, default=32, help="Requests allowed to wait for a composer")
+    parser.add_argument("--queue-timeout", type=float, default=30.0, help="Seconds a request may wait before 503")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.config, args.workers, args.max_queue, args.queue_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import numpy as np
+
+# A pitch-class set is a 12-bit integer: bit n is set when pitch class n (C=0 ... B=11) sounds
+NUM_MASKS = 1 << 12
+FULL_MASK = NUM_MASKS - 1
+
+# Chord names accepted in place of prime forms, with one voicing of each
+SET_CLASS_NAMES = {
+    "triad": (0, 4, 7),  # Major and minor triads share set class 037
+    "diminished": (0, 3, 6),
+    "augmented": (0, 4, 8),
+    "suspended": (0, 5, 7),
+    "dominant7": (0, 4, 7, 10),
+    "major7": (0, 4, 7, 11),
+    "minor7": (0, 3, 7, 10),
+    "diminished7": (0, 3, 6, 9),
+    "quartal": (0, 5, 10),
+    "wholetone": (0, 2, 4, 6, 8, 10),
+}
+
+SCALES = {
+    "major": (0, 2, 4, 5, 7, 9, 11),
+    "minor": (0, 2, 3, 5, 7, 8, 10),
+    "harmonic minor": (0, 2, 3, 5, 7, 8, 11),
+    "melodic minor": (0, 2, 3, 5, 7, 9, 11),
+    "dorian": (0, 2, 3, 5, 7, 9, 10),
+    "phrygian": (0, 1, 3, 5, 7, 8, 10),
+    "lydian": (0, 2, 4, 6, 7, 9, 11),
+    "mixolydian": (0, 2, 4, 5, 7, 9, 10),
+    "pentatonic": (0, 2, 4, 7, 9),
+    "minor pentatonic": (0, 3, 5, 7, 10),
+    "whole tone": (0, 2, 4, 6, 8, 10),
+    "octatonic": (0, 1, 3, 4, 6, 7, 9, 10),
+    "chromatic": tuple(range(12)),
+}
+
+NOTE_PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+# Digits of prime forms; ten and eleven are written t and e
+PC_DIGITS = "0123456789te"
+# Tokens of comma-separated pitch-class lists
+PC_TOKENS = {**{str(pc): pc for pc in range(12)}, "t": 10, "e": 11}
+
+
+def pc_mask(pitch_classes):
+    """Bitmask of a collection of pitch classes or MIDI numbers."""
+    mask = 0
+    for pc in pitch_classes:
+        mask |= 1 << (pc % 12)
+    return mask
+
+
+def mask_to_pcs(mask):
+    return [pc for pc in range(12) if mask >> pc & 1]
+
+
+def transpose_masks(masks, shift):
+    """Masks (an int or an integer array) transposed by shift semitones: a rotation of the 12 bits."""
+    shift %= 12
+    return ((masks << shift) | (masks >> (12 - shift))) & FULL_MASK
+
+
+def parse_pitch_classes(text):
+    """
+    Pitch classes of '037' (one digit each, t and e for 10 and 11) or '0,4,11' (comma-separated
+    0-11, t or e). None when the text is neither.
+    """
+    text = text.strip().lower()
+    tokens = [token.strip() for token in text.split(",")] if "," in text else list(text.replace(" ", ""))
+    if not tokens or any(token not in PC_TOKENS for token in tokens):
+        return None
+    return [PC_TOKENS[token] for token in tokens]
+
+
+def _build_tables():
+    masks = np.arange(NUM_MASKS, dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(12)) & 1  # (4096, 12)
+
+    # Transposition by n rotates the 12 bits; inversion maps pitch class n to -n
+    inverted = (bits[:, (-np.arange(12)) % 12] << np.arange(12)).sum(axis=1)
+    forms = []
+    for source in (masks, inverted):
+        for n in range(12):
+            forms.append(transpose_masks(source, n))
+    # The smallest integer among all 24 forms always contains pitch class 0 and is packed
+    # towards it from the top, i.e. the prime form (Rahn's ordering)
+    prime_forms = np.min(forms, axis=0)
+
+    # Interval class k: pairs of set bits k semitones apart (tritones would be counted twice)
+    interval_vectors = np.stack([(bits & np.roll(bits, -k, axis=1)).sum(axis=1) for k in range(1, 7)], axis=1)
+    interval_vectors[:, 5] //= 2
+    return prime_forms.astype(np.uint16), interval_vectors.astype(np.uint8), bits.sum(axis=1).astype(np.uint8)
+
+
+# Lookup tables indexed by mask
+PRIME_FORMS, INTERVAL_VECTORS, CARDINALITIES = _build_tables()
+
+
+def prime_form_name(mask):
+    """Prime form of a set as digits, e.g. '037' for any major or minor triad."""
+    return "".join(PC_DIGITS[pc] for pc in mask_to_pcs(int(PRIME_FORMS[mask])))
+
+
+def parse_set_class(spec):
+    """Prime form mask of a set class given as a name ('triad') or pitch-class digits ('037', '0,4,7')."""
+    text = spec.strip().lower()
+    if text in SET_CLASS_NAMES:
+        return int(PRIME_FORMS[pc_mask(SET_CLASS_NAMES[text])])
+    pitch_classes = parse_pitch_classes(text)
+    if pitch_classes is None:
+        raise ValueError(f"Set class must be a name ({', '.join(SET_CLASS_NAMES)}) or pitch-class digits "
+                         f"like 037, got: {spec}")
+    return int(PRIME_FORMS[pc_mask(pitch_classes)])
+
+
+def parse_scale(spec):
+    """Mask of a scale given as '<tonic> <mode>' (e.g. 'D dorian', 'Bb major') or pitch-class digits."""
+    text = spec.strip()
+    # Only digit lists contain 0-9 or commas; "E" or "e minor" are tonics, not pitch classes t/e
+    is_digit_list = any(char.isdigit() or char == "," for char in text)
+    pitch_classes = parse_pitch_classes(text) if is_digit_list else None
+    if pitch_classes is not None:
+        return pc_mask(pitch_classes)
+
+    tonic, _, mode = text.partition(" ")
+    mode = mode.strip().lower() or "major"
+    letter = tonic[:1].upper()
+    if letter not in NOTE_PITCH_CLASSES or mode not in SCALES:
+        raise ValueError(f"Scale must be '<tonic> <mode>' with mode in ({', '.join(SCALES)}), got: {spec}")
+    tonic_pc = NOTE_PITCH_CLASSES[letter] + tonic[1:].count("#") - tonic[1:].count("b") - tonic[1:].count("-")
+    return pc_mask(tonic_pc + pc for pc in SCALES[mode])
+
+
+def build_allowed_table(set_classes=(), scale_mask=None, forbidden_intervals=()):
+    """
+    Boolean table over all 4096 masks: True when a chord with these pitch classes is allowed.
+    A chord is allowed when it is a subset of some transposition or inversion of one of the
+    set classes (so chords can be built note by note), lies within the scale and contains
+    none of the forbidden interval classes (1-6).
+    """
+    allowed = np.ones(NUM_MASKS, dtype=bool)
+    masks = np.arange(NUM_MASKS)
+
+    if set_classes:
+        members = np.isin(PRIME_FORMS, list(set_classes))
+        # Close downwards: a mask is allowed when any mask with one more bit set is
+        for bit in range(12):
+            with_bit = masks[(masks >> bit & 1) == 1]
+            members[with_bit ^ (1 << bit)] |= members[with_bit]
+        allowed &= members
+
+    if scale_mask is not None:
+        allowed &= (masks & ~scale_mask) == 0
+
+    for interval_class in forbidden_intervals:
+        if not 1 <= interval_class <= 6:
+            raise ValueError(f"Forbidden intervals are interval classes 1-6, got: {interval_class}")
+        allowed &= INTERVAL_VECTORS[:, interval_class - 1] == 0
+
+    allowed[0] = True
+    return allowed
+
+
+class HarmonyFilter:
+    """Decides with one table lookup per candidate which pitches may be added to a chord."""
+
+    def __init__(self, set_classes=(), scale_mask=None, forbidden_intervals=()):
+        self.set_classes = tuple(set_classes)
+        self.scale_mask = scale_mask
+        self.forbidden_intervals = tuple(forbidden_intervals)
+        self.allowed = build_allowed_table(self.set_classes, scale_mask, self.forbidden_intervals)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build the filter from config_parser.HarmonySettings."""
+        set_classes = [parse_set_class(spec) for spec in settings.set_classes]
+        scale_mask = parse_scale(settings.scale) if settings.scale else None
+        return cls(set_classes, scale_mask, settings.forbidden_intervals)
+
+    def is_allowed(self, midis):
+        return bool(self.allowed[pc_mask(midis)])
+
+    def allowed_shifts(self, masks, shifts):
+        """The transpositions among shifts that keep every chord mask allowed."""
+        masks = np.asarray(masks, dtype=np.int64)
+        return [shift for shift in shifts if self.allowed[transpose_masks(masks, shift)].all()]
+
+    def filter_weights(self, mask, pitch_classes, weights):
+        """Weights of candidates (given by their pitch classes) with 0 where adding them to mask is not allowed."""
+        return np.where(self.allowed[mask | (1 << pitch_classes)], weights, 0)
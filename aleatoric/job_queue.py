@@ -0,0 +1,373 @@
+import argparse
+import os
+import socket
+import sqlite3
+import time
+
+from .stochastic_composer import StochasticComposer
+from .score_exporter import get_output_paths, convert_with_musescore
+from .custom_random import get_random_number, initialize_random_generator, cleanup_random_generator
+
+# Stages of one job, in order; a job is done when all of its stages are checkpointed
+STAGES = ["compose", "musicxml", "midi", "pdf", "mp3"]
+# Stage -> stages whose output it reads
+STAGE_INPUTS = {"musicxml": ["compose"], "midi": ["compose"], "pdf": ["musicxml"], "mp3": ["midi"]}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    seed INTEGER NOT NULL,
+    ensemble TEXT NOT NULL,
+    num_measures INTEGER,
+    title TEXT NOT NULL,
+    stages TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    stage TEXT NOT NULL,
+    output_path TEXT,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+
+def default_owner():
+    """Worker identity stored with a lease: host and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Durable queue of generation jobs in a SQLite file, one job per score.
+    Workers lease jobs for a limited time and renew the lease after every stage;
+    a job whose worker crashed becomes available again when its lease expires.
+    The default rollback journal is used (no WAL), so the file can be shared by
+    workers on several hosts as long as the shared filesystem supports locking.
+    """
+
+    def __init__(self, path="output/jobs.sqlite", lease_seconds=900.0, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._connection = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, sql, parameters=()):
+        """Run one statement in its own write transaction and return the cursor."""
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(sql, parameters)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor
+
+    def enqueue(self, jobs, stages=STAGES):
+        """
+        Add jobs in one transaction. Each job is a dict with seed, ensemble and optionally
+        num_measures (None = drawn from the seed), title and name (default: <ensemble>_<seed>).
+        Jobs whose name is already queued are skipped. Returns the number of jobs added.
+        """
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stage(s) {unknown}. Available: {STAGES}")
+        for stage in stages:
+            missing = [required for required in STAGE_INPUTS.get(stage, []) if required not in stages]
+            if missing:
+                raise ValueError(f"Stage '{stage}' needs stage(s) {missing}.")
+        stages = ",".join(stage for stage in STAGES if stage in stages)
+
+        now = time.time()
+        rows = []
+        for job in jobs:
+            ensemble = job["ensemble"]
+            name = job.get("name") or f"{ensemble.lower().replace(' ', '_')}_{job['seed']}"
+            rows.append((name, job["seed"], ensemble, job.get("num_measures"),
+                         job.get("title", f"Aleatoric Music - {ensemble}"), stages, now))
+
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs (name, seed, ensemble, num_measures, title, stages, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            added = connection.total_changes - before
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return added
+
+    def lease(self, owner=None):
+        """
+        Lease the oldest pending (or abandoned) job; returns the job row or None if there is none.
+        An abandoned job that has used max_attempts is marked failed instead, so a job that keeps
+        killing its worker (out of memory, a crashing converter) is not retried forever.
+        """
+        owner = owner or default_owner()
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, lease_expires = NULL, finished_at = ?, "
+                "error = 'Lease expired after ' || attempts || ' attempts (worker stopped responding)' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, now, self.max_attempts))
+            job = connection.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if job is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?", (owner, now + self.lease_seconds, job["id"]))
+                job = connection.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return job
+
+    def heartbeat(self, job_id, owner=None):
+        """Extend a lease. Returns False if the lease was lost (expired and taken by another worker)."""
+        cursor = self._write(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, job_id, owner or default_owner()))
+        return cursor.rowcount == 1
+
+    def complete_stage(self, job_id, stage, output_path=None):
+        """Checkpoint a finished stage so a restarted job skips it."""
+        self._write("INSERT OR REPLACE INTO job_stages (job_id, stage, output_path, completed_at) VALUES (?, ?, ?, ?)",
+                    (job_id, stage, output_path, time.time()))
+
+    def completed_stages(self, job_id):
+        """{stage: output path} of the checkpointed stages of a job."""
+        rows = self._connection.execute("SELECT stage, output_path FROM job_stages WHERE job_id = ?", (job_id,))
+        return {row["stage"]: row["output_path"] for row in rows}
+
+    def finish(self, job_id, owner=None):
+        """Mark a leased job done. Raises RuntimeError if the lease was lost to another worker."""
+        cursor = self._write("UPDATE jobs SET status = 'done', lease_owner = NULL, lease_expires = NULL, error = NULL, "
+                             "finished_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                             (time.time(), job_id, owner or default_owner()))
+        if cursor.rowcount != 1:
+            raise RuntimeError(f"Lease on job {job_id} was lost; it was not marked done.")
+
+    def fail(self, job_id, error, owner=None):
+        """Record a failed attempt; the job goes back to pending until it has used max_attempts."""
+        self._write("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                    "lease_owner = NULL, lease_expires = NULL, error = ?, "
+                    "finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END "
+                    "WHERE id = ? AND lease_owner = ?",
+                    (self.max_attempts, str(error), self.max_attempts, time.time(), job_id,
+                     owner or default_owner()))
+
+    def retry_failed(self):
+        """Put all failed jobs back in the queue with a fresh attempt budget. Returns their number."""
+        cursor = self._write("UPDATE jobs SET status = 'pending', attempts = 0, finished_at = NULL "
+                             "WHERE status = 'failed'")
+        return cursor.rowcount
+
+    def stats(self, windows=(60, 3600)):
+        """Job counts by status, queue depth and finished jobs per minute over recent windows (seconds)."""
+        connection = self._connection
+        now = time.time()
+        counts = {status: 0 for status in ("pending", "leased", "done", "failed")}
+        for row in connection.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"):
+            counts[row["status"]] = row["count"]
+        expired = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased' AND lease_expires < ?",
+                                     (now,)).fetchone()[0]
+
+        throughput = {}
+        for window in windows:
+            finished = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+                                          (now - window,)).fetchone()[0]
+            throughput[window] = finished * 60.0 / window
+        workers = connection.execute("SELECT COUNT(DISTINCT lease_owner) FROM jobs WHERE status = 'leased' "
+                                     "AND lease_expires >= ?", (now,)).fetchone()[0]
+        return {
+            "counts": counts,
+            "depth": counts["pending"] + expired,
+            "active_workers": workers,
+            "jobs_per_minute": throughput,
+        }
+
+
+def _write_atomically(score, fmt, path):
+    """Write via a temporary file so a crash never leaves a truncated output behind."""
+    root, extension = os.path.splitext(path)
+    temporary = f"{root}.partial{extension}"
+    score.write(fmt, fp=temporary)
+    os.replace(temporary, path)
+
+
+def run_job(queue, composer, job, owner=None):
+    """
+    Run the missing stages of a leased job, checkpointing after each one.
+    The score is recomposed from the job's seed only when a remaining stage needs it;
+    the same seed always gives the same score, so resumed outputs match the earlier ones.
+    """
+    owner = owner or default_owner()
+    stages = job["stages"].split(",")
+    done = queue.completed_stages(job["id"])
+    paths = get_output_paths(job["name"])
+    score = None
+
+    for stage in stages:
+        if stage in done:
+            continue
+        output_path = None
+        if stage in ("compose", "musicxml", "midi") and score is None:
+            score = composer.create_random_score(job["ensemble"], job["num_measures"], job["title"],
+                                                 seed=job["seed"])
+        if stage == "musicxml":
+            output_path = paths['musicxml']
+            _write_atomically(score, 'musicxml', output_path)
+        elif stage == "midi":
+            output_path = paths['midi']
+            _write_atomically(score, 'midi', output_path)
+        elif stage == "pdf":
+            output_path = paths['pdf']
+            if not convert_with_musescore(done["musicxml"], output_path):
+                raise RuntimeError("PDF conversion failed: MuseScore not found or conversion error.")
+        elif stage == "mp3":
+            output_path = paths['mp3']
+            if not convert_with_musescore(done["midi"], output_path, for_audio=True):
+                raise RuntimeError("MP3 conversion failed: MuseScore not found or conversion error.")
+
+        queue.complete_stage(job["id"], stage, output_path)
+        done[stage] = output_path
+        if not queue.heartbeat(job["id"], owner):
+            raise RuntimeError(f"Lease on job {job['id']} was lost.")
+
+    queue.finish(job["id"], owner)
+
+
+def run_worker(queue_path="output/jobs.sqlite", config_path="config/config.xml", max_jobs=None,
+               exit_when_empty=False, poll_interval=5.0, lease_seconds=900.0, max_attempts=3):
+    """Lease and run jobs until the queue is empty (or forever, polling for new jobs)."""
+    owner = default_owner()
+    composer = StochasticComposer(config_path)
+    processed = 0
+    with JobQueue(queue_path, lease_seconds, max_attempts) as queue:
+        print(f"Worker {owner} started on {queue_path}")
+        while max_jobs is None or processed < max_jobs:
+            job = queue.lease(owner)
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            start = time.perf_counter()
+            print(f"Job {job['id']} ({job['name']}, attempt {job['attempts']}): {job['ensemble']}, seed {job['seed']}")
+            try:
+                run_job(queue, composer, job, owner)
+                print(f"Job {job['id']} done in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                print(f"Job {job['id']} failed: {e}")
+                queue.fail(job["id"], e, owner)
+            processed += 1
+        print(f"Worker {owner} finished after {processed} jobs")
+    return processed
+
+
+def print_stats(stats):
+    counts = stats["counts"]
+    print(f"Queue depth: {stats['depth']}")
+    print(f"Jobs: {counts['pending']} pending, {counts['leased']} leased, {counts['done']} done, "
+          f"{counts['failed']} failed")
+    print(f"Active workers: {stats['active_workers']}")
+    for window, rate in stats["jobs_per_minute"].items():
+        print(f"Throughput (last {window}s): {rate:.2f} jobs/min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable job queue for long generation runs.")
+    parser.add_argument("--queue", default="output/jobs.sqlite", help="SQLite file of the queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add generation jobs")
+    enqueue_parser.add_argument("--count", type=int, default=1)
+    enqueue_parser.add_argument("--ensemble", default=None, help="Ensemble for all jobs (default: random per job)")
+    enqueue_parser.add_argument("--measures", type=int, default=None, help="Measures (default: drawn from the seed)")
+    enqueue_parser.add_argument("--seed-start", type=int, default=None,
+                                help="Use consecutive seeds from here (default: seeds from the webcam)")
+    enqueue_parser.add_argument("--stages", default=",".join(STAGES), help="Comma separated stages to run")
+    enqueue_parser.add_argument("--config", default="config/config.xml")
+
+    work_parser = subparsers.add_parser("work", help="Run a worker")
+    work_parser.add_argument("--config", default="config/config.xml")
+    work_parser.add_argument("--max-jobs", type=int, default=None)
+    work_parser.add_argument("--exit-when-empty", action="store_true")
+    work_parser.add_argument("--lease", type=float, default=900.0, help="Lease duration in seconds")
+    work_parser.add_argument("--max-attempts", type=int, default=3)
+
+    subparsers.add_parser("stats", help="Print queue depth and throughput")
+    subparsers.add_parser("retry-failed", help="Requeue all failed jobs")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        ensembles = list(StochasticComposer(args.config).config.ensembles.keys())
+        if args.ensemble is not None and args.ensemble not in ensembles:
+            raise ValueError(f"Ensemble '{args.ensemble}' not found. Available: {ensembles}")
+        if args.seed_start is None:
+            initialize_random_generator()
+        try:
+            jobs = []
+            for index in range(args.count):
+                if args.seed_start is not None:
+                    seed = args.seed_start + index
+                else:
+                    seed = get_random_number(0, 2**32 - 1)
+                ensemble = args.ensemble
+                if ensemble is None:
+                    # Pick the ensemble from the seed so the job list is reproducible
+                    ensemble = ensembles[seed % len(ensembles)]
+                jobs.append({"seed": seed, "ensemble": ensemble, "num_measures": args.measures})
+        finally:
+            if args.seed_start is None:
+                cleanup_random_generator()
+        with JobQueue(args.queue) as queue:
+            added = queue.enqueue(jobs, args.stages.split(","))
+        print(f"Enqueued {added} jobs ({len(jobs) - added} already queued)")
+    elif args.command == "work":
+        run_worker(args.queue, args.config, args.max_jobs, args.exit_when_empty,
+                   lease_seconds=args.lease, max_attempts=args.max_attempts)
+    elif args.command == "stats":
+        with JobQueue(args.queue) as queue:
+            print_stats(queue.stats())
+    elif args.command == "retry-failed":
+        with JobQueue(args.queue) as queue:
+            print(f"Requeued {queue.retry_failed()} failed jobs")
+
+
+if __name__ == "__main__":
+    main()
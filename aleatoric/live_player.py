@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import itertools
+import queue
+import sys
+import threading
+import time
+
+from music21 import dynamics
+
+from .stochastic_composer import StochasticComposer
+from .custom_random import get_random_number, get_random_generator
+
+# MIDI channel 10 (index 9) is reserved for percussion
+MELODIC_CHANNELS = [channel for channel in range(16) if channel != 9]
+
+# Velocities for the dynamics used in config.xml
+DYNAMIC_VELOCITIES = {
+    "ppp": 16, "pp": 33, "p": 49, "mp": 64, "mf": 80, "f": 96, "ff": 112, "fff": 127,
+}
+
+
+class LiveEvent:
+    """A single MIDI event at an absolute position (in beats) of the live piece."""
+    __slots__ = ("beat", "type", "channel", "note", "velocity", "program")
+
+    def __init__(self, beat, type, channel, note=0, velocity=0, program=0):
+        self.beat = beat
+        self.type = type
+        self.channel = channel
+        self.note = note
+        self.velocity = velocity
+        self.program = program
+
+    def __repr__(self):
+        return f"LiveEvent({self.beat}, {self.type}, ch={self.channel}, note={self.note}, vel={self.velocity})"
+
+
+class MidoPortSink:
+    """Sends live events to a mido output port (hardware synth, virtual port, DAW)."""
+
+    def __init__(self, port_name=None):
+        import mido  # Only needed when playing to a real port
+        self._mido = mido
+        self.port = mido.open_output(port_name)
+
+    def send(self, event, due_time, actual_time):
+        if event.type == "program_change":
+            message = self._mido.Message("program_change", channel=event.channel, program=event.program)
+        else:
+            message = self._mido.Message(event.type, channel=event.channel, note=event.note, velocity=event.velocity)
+        self.port.send(message)
+
+    def close(self):
+        # Silence anything still sounding before the port goes away
+        self.port.reset()
+        self.port.close()
+
+
+class FileSink:
+    """Writes live events as tab separated lines to a file or pipe; a stand-in for a MIDI port."""
+
+    def __init__(self, target=sys.stdout):
+        self._owns_file = isinstance(target, str)
+        self.file = open(target, "w") if self._owns_file else target
+        self.file.write("due_s\tactual_s\tbeat\ttype\tchannel\tnote\tvelocity\n")
+
+    def send(self, event, due_time, actual_time):
+        value = event.program if event.type == "program_change" else event.note
+        self.file.write(f"{due_time:.4f}\t{actual_time:.4f}\t{event.beat:g}\t{event.type}\t"
+                        f"{event.channel}\t{value}\t{event.velocity}\n")
+        self.file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+
+
+class JitterStats:
+    """Timing statistics of the playback thread."""
+
+    def __init__(self):
+        self.events = 0
+        self.late_events = 0
+        self.dropped_events = 0
+        self.underruns = 0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+        self.min_lead = None  # Smallest distance between measure ready and measure due
+
+    def record_event(self, jitter):
+        self.events += 1
+        self.total_jitter += abs(jitter)
+        self.max_jitter = max(self.max_jitter, abs(jitter))
+
+    def record_lead(self, lead):
+        if self.min_lead is None or lead < self.min_lead:
+            self.min_lead = lead
+
+    def summary(self):
+        mean = self.total_jitter / self.events if self.events else 0.0
+        return {
+            "events": self.events,
+            "mean_jitter_ms": round(mean * 1000, 3),
+            "max_jitter_ms": round(self.max_jitter * 1000, 3),
+            "late_events": self.late_events,
+            "dropped_events": self.dropped_events,
+            "underruns": self.underruns,
+            "min_lead_ms": round(self.min_lead * 1000, 1) if self.min_lead is not None else None,
+        }
+
+
+class LivePlayer:
+    """
+    Generates measures just ahead of the playhead and plays them as timed MIDI events.
+    A composer thread fills a bounded look-ahead queue while a separate playback thread
+    only sleeps and sends, so composing and entropy refills never delay note output.
+    """
+
+    def __init__(self, sink, ensemble_name="Piano Solo", tempo=100, lookahead_measures=2,
+                 latency_budget=0.005, beats_per_measure=4, config_path="config/config.xml"):
+        self.composer = StochasticComposer(config_path)
+        if ensemble_name not in self.composer.config.ensembles:
+            available = list(self.composer.config.ensembles.keys())
+            raise ValueError(f"Ensemble '{ensemble_name}' not found. Available: {available}")
+
+        self.sink = sink
+        self.ensemble = self.composer.config.ensembles[ensemble_name]
+        self.seconds_per_beat = 60.0 / tempo
+        self.beats_per_measure = beats_per_measure
+        self.latency_budget = latency_budget
+        self.stats = JitterStats()
+        self._measures = queue.Queue(maxsize=lookahead_measures)
+        self._stop = threading.Event()
+        self._channels = {}
+        self._current_dynamics = {}
+
+    def measure_to_events(self, measure, channel, start_beat, part_key):
+        """Convert a generated measure into note on/off events starting at start_beat."""
+        events = []
+        velocity = DYNAMIC_VELOCITIES.get(self._current_dynamics.get(part_key), 80)
+
+        for element in measure.getElementsByClass(dynamics.Dynamic):
+            self._current_dynamics[part_key] = element.value
+            velocity = DYNAMIC_VELOCITIES.get(element.value, velocity)
+
+        for element in measure.notes:
+            on_beat = start_beat + float(element.offset)
+            off_beat = on_beat + float(element.quarterLength)
+            for p in element.pitches:
+                events.append(LiveEvent(on_beat, "note_on", channel, p.midi, velocity))
+                events.append(LiveEvent(off_beat, "note_off", channel, p.midi, 0))
+        return events
+
+    def _compose_measure(self, measure_index):
+        """Generate one measure for every instrument and return its events sorted by time."""
+        start_beat = measure_index * self.beats_per_measure
+        events = []
+
+        for instr_index, instr in enumerate(self.ensemble.instruments):
+            channel = self._channels[instr_index]
+            # Occasionally add new dynamics, as in create_random_score
+            new_dynamic = None
+            if get_random_number(1, 100) <= 20:  # 20% chance
+                new_dynamic = self.composer.get_random_dynamic()
+
+            if isinstance(self.composer.get_clef_from_name(instr.clef), list):
+                measures = self.composer.create_random_grand_staff_measure(instr, self.beats_per_measure)
+            else:
+                measures = [self.composer.create_random_measure(instr, self.beats_per_measure)]
+
+            for measure in measures:
+                if new_dynamic:
+                    measure.insert(0, dynamics.Dynamic(new_dynamic))
+                events.extend(self.measure_to_events(measure, channel, start_beat, instr_index))
+
+        # note_off before note_on at the same beat so repeated pitches retrigger
+        events.sort(key=lambda e: (e.beat, e.type != "note_off"))
+        return events
+
+    def _composer_loop(self, num_measures):
+        """Composer thread: keeps the look-ahead queue full."""
+        measure_indices = range(num_measures) if num_measures is not None else itertools.count()
+        try:
+            for measure_index in measure_indices:
+                if self._stop.is_set():
+                    break
+                events = self._compose_measure(measure_index)
+                ready_time = time.perf_counter()
+                # Blocks while the queue is full, i.e. while we are far enough ahead
+                while not self._stop.is_set():
+                    try:
+                        self._measures.put((measure_index, events, ready_time), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            # End marker; give up only if playback has already stopped reading
+            while True:
+                try:
+                    self._measures.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        break
+
+    def _wait_until(self, due_time):
+        """Sleep coarsely, then spin for the last millisecond to keep jitter low."""
+        while True:
+            remaining = due_time - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > 0.002:
+                time.sleep(remaining - 0.001)
+
+    def _play_events(self, start_time, events):
+        for event in events:
+            due_time = start_time + event.beat * self.seconds_per_beat
+            self._wait_until(due_time)
+            actual_time = time.perf_counter()
+            jitter = actual_time - due_time
+
+            if jitter > self.latency_budget:
+                self.stats.late_events += 1
+                # A note that is hopelessly late is dropped; its note_off is still sent
+                if event.type == "note_on" and jitter > self.latency_budget * 10:
+                    self.stats.dropped_events += 1
+                    continue
+
+            self.sink.send(event, due_time - start_time, actual_time - start_time)
+            self.stats.record_event(jitter)
+
+    def play(self, num_measures=None):
+        """Play num_measures measures, or forever when num_measures is None, until stop()."""
+        for instr_index, instr in enumerate(self.ensemble.instruments):
+            self._channels[instr_index] = MELODIC_CHANNELS[instr_index % len(MELODIC_CHANNELS)]
+
+        # Keep entropy refills on a background thread so the composer never waits for the camera
+        generator = get_random_generator()
+        if hasattr(generator, "start_background_refill"):
+            generator.start_background_refill()
+
+        composer_thread = threading.Thread(target=self._composer_loop, args=(num_measures,),
+                                           name="live-composer", daemon=True)
+        composer_thread.start()
+
+        # Let the composer get ahead before the playhead starts
+        first = self._measures.get()
+        start_time = time.perf_counter() + self.latency_budget * 2
+        setup = []
+        for instr_index, instr in enumerate(self.ensemble.instruments):
+            program = self.composer.get_music21_instrument(instr.name).midiProgram or 0
+            setup.append(LiveEvent(0, "program_change", self._channels[instr_index], program=program))
+        self._play_events(start_time, setup)
+
+        item = first
+        try:
+            while item is not None and not self._stop.is_set():
+                measure_index, events, ready_time = item
+                due_time = start_time + measure_index * self.beats_per_measure * self.seconds_per_beat
+                lead = due_time - ready_time
+                self.stats.record_lead(lead)
+                if lead < self.latency_budget:
+                    self.stats.underruns += 1
+                self._play_events(start_time, events)
+                item = self._measures.get()
+        except KeyboardInterrupt:
+            print("Stopping live playback...")
+        finally:
+            self._stop.set()
+            composer_thread.join(timeout=1.0)
+            self.sink.close()
+
+        return self.stats.summary()
+
+    def stop(self):
+        """Ask the player to stop after the current measure."""
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time stochastic music generation.")
+    parser.add_argument("--ensemble", default="Piano Solo")
+    parser.add_argument("--tempo", type=float, default=100, help="Quarter notes per minute")
+    parser.add_argument("--measures", type=int, default=None, help="Number of measures (default: endless)")
+    parser.add_argument("--lookahead", type=int, default=2, help="Measures generated ahead of the playhead")
+    parser.add_argument("--latency-budget", type=float, default=5.0, help="Allowed lateness in milliseconds")
+    parser.add_argument("--port", default=None, help="mido output port name (default: system default port)")
+    parser.add_argument("--output", default=None, help="Write events to a file or pipe instead of a MIDI port")
+    parser.add_argument("--config", default="config/config.xml")
+    args = parser.parse_args()
+
+    if args.output is not None:
+        sink = FileSink(sys.stdout if args.output == "-" else args.output)
+    else:
+        sink = MidoPortSink(args.port)
+
+    # With --output - the events own stdout; status messages (pool refills, composer) go to stderr
+    log_target = sys.stderr if args.output == "-" else sys.stdout
+    with contextlib.redirect_stdout(log_target):
+        player = LivePlayer(sink, args.ensemble, args.tempo, args.lookahead,
+                            args.latency_budget / 1000.0, config_path=args.config)
+        stats = player.play(args.measures)
+    print(f"Live playback finished: {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+import argparse
+import glob
+import json
+import os
+import re
+import secrets
+
+import numpy as np
+from music21 import articulations, chord, clef, dynamics, layout, metadata, meter, note, stream
+
+from .score_features import DYNAMIC_NAMES
+
+# One fixed-width record per note, chord tone, rest or dynamic marking (16 bytes)
+EVENT_DTYPE = np.dtype([
+    ("part", "<u1"),
+    ("kind", "<u1"),
+    ("pitch", "<u1"),  # MIDI pitch for notes and chord tones
+    ("articulation", "<u1"),
+    ("value", "<u1"),  # Index into the piece's dynamic names (meta "dynamics") for dynamics
+    ("reserved", "<u1"),
+    ("measure", "<u2"),
+    ("offset", "<f4"),  # In quarter notes from the start of the measure
+    ("duration", "<f4"),  # In quarter notes
+])
+
+# One record per piece: where its events and metadata live in the shard files (24 bytes)
+INDEX_DTYPE = np.dtype([
+    ("event_start", "<u8"),
+    ("event_count", "<u4"),
+    ("meta_start", "<u8"),
+    ("meta_length", "<u4"),
+])
+
+# Event kinds
+KIND_REST = 0
+KIND_NOTE = 1
+KIND_CHORD_TONE = 2  # Consecutive chord tones with the same part, measure and offset form one chord
+KIND_DYNAMIC = 3
+KIND_PART_DYNAMIC = 4  # Dynamic at the start of the part, outside any measure
+
+ARTICULATION_CODES = {"staccato": 1, "accent": 2, "tenuto": 3}
+ARTICULATION_CLASSES = {1: articulations.Staccato, 2: articulations.Accent, 3: articulations.Tenuto}
+
+CLEF_NAMES = {clef.TrebleClef: "treble", clef.BassClef: "bass", clef.AltoClef: "alto", clef.TenorClef: "tenor"}
+
+# Piece IDs carry their shard in the upper 32 bits, so a lookup never needs a global table
+SHARD_SHIFT = 32
+SHARD_PATTERN = re.compile(r"shard-(\d+)\.index$")
+
+
+def make_piece_id(shard, index):
+    return (shard << SHARD_SHIFT) | index
+
+
+def split_piece_id(piece_id):
+    return piece_id >> SHARD_SHIFT, piece_id & ((1 << SHARD_SHIFT) - 1)
+
+
+def _shard_paths(directory, shard):
+    base = os.path.join(directory, f"shard-{shard}")
+    return f"{base}.events", f"{base}.meta", f"{base}.index"
+
+
+def _lock_shard(directory, shard):
+    """
+    Open the shard's lock file and take an exclusive lock on it, or return None when another
+    writer holds it. The operating system releases the lock when the writer exits, even after a crash.
+    """
+    lock_file = open(os.path.join(directory, f"shard-{shard}.lock"), "ab")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _articulation_code(element):
+    for articulation in element.articulations:
+        code = ARTICULATION_CODES.get(articulation.name)
+        if code:
+            return code
+    return 0
+
+
+def encode_score(score, ensemble_name=None, seed=None):
+    """Flatten a generated score into an event record array and a metadata dict."""
+    records = []
+    parts_meta = []
+    # Dynamic names in order of first use; config.xml may contain any marking (e.g. sfz)
+    dynamic_names = []
+
+    def dynamic_index(name):
+        if name not in dynamic_names:
+            if len(dynamic_names) == 256:
+                raise ValueError("A piece can use at most 256 different dynamic markings.")
+            dynamic_names.append(name)
+        return dynamic_names.index(name)
+
+    def add(part_index, kind, measure_index, offset, duration=0.0, midi=0, articulation=0, value=0):
+        records.append((part_index, kind, midi, articulation, value, 0, measure_index, offset, duration))
+
+    # Parts joined by a brace (grand staff) keep the name of their StaffGroup
+    groups = {}
+    for staff_group in score.getElementsByClass(layout.StaffGroup):
+        for part in staff_group.getSpannedElements():
+            groups[id(part)] = staff_group.name
+
+    for part_index, part in enumerate(score.parts):
+        part_clef = next(iter(part.getElementsByClass(clef.Clef)), None)
+        parts_meta.append({
+            "name": part.partName,
+            "id": str(part.id) if isinstance(part.id, str) else None,
+            "clef": CLEF_NAMES.get(type(part_clef), "treble"),
+            "group": groups.get(id(part)),
+        })
+
+        for dynamic in part.getElementsByClass(dynamics.Dynamic):
+            add(part_index, KIND_PART_DYNAMIC, 0, float(dynamic.offset), value=dynamic_index(dynamic.value))
+
+        for measure_index, measure in enumerate(part.getElementsByClass(stream.Measure)):
+            for element in measure:
+                offset = float(element.offset)
+                if isinstance(element, dynamics.Dynamic):
+                    add(part_index, KIND_DYNAMIC, measure_index, offset, value=dynamic_index(element.value))
+                elif isinstance(element, note.Rest):
+                    add(part_index, KIND_REST, measure_index, offset, float(element.quarterLength))
+                elif isinstance(element, chord.Chord):
+                    code = _articulation_code(element)
+                    for p in element.pitches:
+                        add(part_index, KIND_CHORD_TONE, measure_index, offset, float(element.quarterLength), p.midi, code)
+                elif isinstance(element, note.Note):
+                    add(part_index, KIND_NOTE, measure_index, offset, float(element.quarterLength),
+                        element.pitch.midi, _articulation_code(element))
+
+    meta = {
+        "title": score.metadata.title if score.metadata is not None else None,
+        "ensemble": ensemble_name,
+        "seed": seed,
+        "time_signature": "4/4",
+        "parts": parts_meta,
+        "dynamics": dynamic_names,
+    }
+    return np.array(records, dtype=EVENT_DTYPE), meta
+
+
+def decode_parts(events, meta, composer):
+    """Rebuild the music21 Parts of a piece from its event records and metadata (see encode_score)."""
+    # Archives written before pieces stored their own table used DYNAMIC_NAMES
+    dynamic_names = meta.get("dynamics", DYNAMIC_NAMES)
+
+    parts = []
+    for part_meta in meta["parts"]:
+        part = stream.Part()
+        part.partName = part_meta["name"]
+        if part_meta["id"]:
+            part.id = part_meta["id"]
+        part.insert(0, composer.get_music21_instrument(part_meta["name"]))
+        part.insert(0, composer.get_clef_from_name(part_meta["clef"]))
+        part.insert(0, meter.TimeSignature(meta["time_signature"]))
+        parts.append(part)
+
+    measures = {}
+    pending_chord = None  # (measure, offset, duration, articulation, [midi, ...])
+
+    def flush_chord():
+        if pending_chord is not None:
+            target, offset, duration, code, midis = pending_chord
+            # Spell pitches the way the composer does
+            c = chord.Chord([composer.midi_to_note_name(m) for m in midis], quarterLength=duration)
+            if code:
+                c.articulations.append(ARTICULATION_CLASSES[code]())
+            target.insert(offset, c)
+
+    for event in events.tolist():
+        part_index, kind, midi, code, value, _, measure_index, offset, duration = event
+        if kind == KIND_PART_DYNAMIC:
+            parts[part_index].insert(offset, dynamics.Dynamic(dynamic_names[value]))
+            continue
+
+        key = (part_index, measure_index)
+        target = measures.get(key)
+        if target is None:
+            target = measures[key] = stream.Measure(number=measure_index + 1)
+
+        if kind == KIND_CHORD_TONE:
+            if pending_chord is not None and pending_chord[0] is target and pending_chord[1] == offset:
+                pending_chord[4].append(midi)
+                continue
+            flush_chord()
+            pending_chord = (target, offset, duration, code, [midi])
+            continue
+
+        flush_chord()
+        pending_chord = None
+        if kind == KIND_DYNAMIC:
+            target.insert(offset, dynamics.Dynamic(dynamic_names[value]))
+        elif kind == KIND_REST:
+            target.insert(offset, note.Rest(quarterLength=duration))
+        elif kind == KIND_NOTE:
+            n = note.Note(composer.midi_to_note_name(midi), quarterLength=duration)
+            if code:
+                n.articulations.append(ARTICULATION_CLASSES[code]())
+            target.insert(offset, n)
+    flush_chord()
+
+    for (part_index, _), measure in sorted(measures.items(), key=lambda item: item[0]):
+        parts[part_index].append(measure)
+    return parts
+
+
+class ScoreArchiveWriter:
+    """
+    Append-only writer for one shard of a score archive. Every writer holds an exclusive lock
+    on its shard, so parallel workers never share a file; by default a free random 31-bit shard
+    is picked, which stays unique across hosts writing to the same directory.
+    The index record is written last and acts as the commit point of a piece.
+    """
+
+    def __init__(self, directory="output/archive", shard=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if shard is None:
+            self._lock = None
+            while self._lock is None:
+                shard = secrets.randbits(31)
+                self._lock = _lock_shard(directory, shard)
+        else:
+            self._lock = _lock_shard(directory, shard)
+            if self._lock is None:
+                raise RuntimeError(f"Shard {shard} in {directory} is locked by another writer")
+        self.shard = shard
+        events_path, meta_path, index_path = _shard_paths(directory, self.shard)
+
+        # After a crash: drop a torn index record and anything written after the last committed piece
+        events_end = meta_end = 0
+        if os.path.exists(index_path):
+            size = os.path.getsize(index_path)
+            with open(index_path, "r+b") as f:
+                f.truncate(size - size % INDEX_DTYPE.itemsize)
+                if size >= INDEX_DTYPE.itemsize:
+                    f.seek(-INDEX_DTYPE.itemsize, os.SEEK_END)
+                    last = np.frombuffer(f.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)[0]
+                    events_end = (int(last["event_start"]) + int(last["event_count"])) * EVENT_DTYPE.itemsize
+                    meta_end = int(last["meta_start"]) + int(last["meta_length"])
+        for path, end in ((events_path, events_end), (meta_path, meta_end)):
+            if os.path.exists(path) and os.path.getsize(path) > end:
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+
+        self._events = open(events_path, "ab")
+        self._meta = open(meta_path, "ab")
+        self._index = open(index_path, "ab")
+        self._count = self._index.tell() // INDEX_DTYPE.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append_score(self, score, ensemble_name=None, seed=None):
+        """Append a score and return its piece ID."""
+        events, meta = encode_score(score, ensemble_name, seed)
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+
+        event_start = self._events.tell() // EVENT_DTYPE.itemsize
+        self._events.write(events.tobytes())
+        meta_start = self._meta.tell()
+        self._meta.write(meta_bytes)
+        self._events.flush()
+        self._meta.flush()
+
+        entry = np.array([(event_start, len(events), meta_start, len(meta_bytes))], dtype=INDEX_DTYPE)
+        self._index.write(entry.tobytes())
+        self._index.flush()
+
+        piece_id = make_piece_id(self.shard, self._count)
+        self._count += 1
+        return piece_id
+
+    def close(self):
+        for f in (self._events, self._meta, self._index, self._lock):
+            f.close()
+
+
+def _map_file(path, dtype):
+    """Memory-map a file as an array; empty files map to an empty array."""
+    if os.path.getsize(path) < np.dtype(dtype).itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(os.path.getsize(path) // np.dtype(dtype).itemsize,))
+
+
+class ScoreArchive:
+    """Read-only, memory-mapped view of a score archive with O(1) access by piece ID."""
+
+    def __init__(self, directory="output/archive"):
+        self.directory = directory
+        self.refresh()
+
+    def refresh(self):
+        """Map all shards again to see pieces appended since the archive was opened."""
+        self._shards = {}
+        for index_path in glob.glob(os.path.join(self.directory, "shard-*.index")):
+            match = SHARD_PATTERN.search(os.path.basename(index_path))
+            if not match:
+                continue
+            shard = int(match.group(1))
+            events_path, meta_path, _ = _shard_paths(self.directory, shard)
+            self._shards[shard] = (
+                _map_file(events_path, EVENT_DTYPE),
+                _map_file(meta_path, np.uint8),
+                _map_file(index_path, INDEX_DTYPE),
+            )
+
+    def __len__(self):
+        return sum(len(index) for _, _, index in self._shards.values())
+
+    def __contains__(self, piece_id):
+        shard, position = split_piece_id(piece_id)
+        return shard in self._shards and position < len(self._shards[shard][2])
+
+    def piece_ids(self):
+        """Iterate over all piece IDs, shard by shard."""
+        for shard in sorted(self._shards):
+            for position in range(len(self._shards[shard][2])):
+                yield make_piece_id(shard, position)
+
+    def _entry(self, piece_id):
+        if piece_id not in self:
+            raise KeyError(f"Piece {piece_id} not found in archive {self.directory}")
+        shard, position = split_piece_id(piece_id)
+        events, meta, index = self._shards[shard]
+        return events, meta, index[position]
+
+    def get_events(self, piece_id):
+        """The event records of a piece (a view into the memory map, nothing is copied)."""
+        events, _, entry = self._entry(piece_id)
+        start = int(entry["event_start"])
+        return events[start:start + int(entry["event_count"])]
+
+    def get_metadata(self, piece_id):
+        _, meta, entry = self._entry(piece_id)
+        start = int(entry["meta_start"])
+        return json.loads(bytes(meta[start:start + int(entry["meta_length"])]).decode("utf-8"))
+
+    def to_score(self, piece_id, composer=None):
+        """Rebuild a music21 Score from the archived events."""
+        if composer is None:
+            from .stochastic_composer import StochasticComposer
+            composer = StochasticComposer()
+
+        meta = self.get_metadata(piece_id)
+        parts = decode_parts(self.get_events(piece_id), meta, composer)
+
+        score = stream.Score()
+        score.append(metadata.Metadata())
+        score.metadata.title = meta["title"]
+        score.metadata.composer = "Stochastic Music Generator"
+        for part in parts:
+            score.append(part)
+
+        # Restore grand staff braces
+        grouped = {}
+        for part, part_meta in zip(parts, meta["parts"]):
+            if part_meta["group"]:
+                grouped.setdefault(part_meta["group"], []).append(part)
+        for name, group_parts in grouped.items():
+            score.insert(0, layout.StaffGroup(group_parts, name=name, abbreviation=name[:4], symbol="brace"))
+        return score
+
+
+def export_piece(archive, piece_id, filename=None, composer=None):
+    """Convert an archived piece to MusicXML, PDF, MIDI and MP3 via score_exporter."""
+    from .score_exporter import generate_pdf_and_mp3
+
+    score = archive.to_score(piece_id, composer)
+    generate_pdf_and_mp3(score, filename or f"piece_{piece_id}")
+    return score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and export pieces from a score archive.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="List archived pieces")
+    list_parser.add_argument("directory", nargs="?", default="output/archive")
+    export_parser = subparsers.add_parser("export", help="Export one piece to MusicXML/PDF/MIDI/MP3")
+    export_parser.add_argument("piece_id", type=int)
+    export_parser.add_argument("--directory", default="output/archive")
+    export_parser.add_argument("--name", default=None, help="Output name (default: piece_<id>)")
+    args = parser.parse_args()
+
+    archive = ScoreArchive(args.directory)
+    if args.command == "list":
+        print(f"{len(archive)} pieces in {args.directory}")
+        for piece_id in archive.piece_ids():
+            meta = archive.get_metadata(piece_id)
+            print(f"  {piece_id}: {meta['title']} ({meta['ensemble']}, seed {meta['seed']}, "
+                  f"{len(archive.get_events(piece_id))} events)")
+    elif args.command == "export":
+        export_piece(archive, args.piece_id, args.name)
+
+
+if __name__ == "__main__":
+    main()
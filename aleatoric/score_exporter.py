@@ -2,54 +2,77 @@ import subprocess
 import os
 import platform
 from music21 import midi
-def generate_pdf_with_title(score, filename="aleatory_music"):
+from music21.musicxml.m21ToXml import GeneralObjectExporter
+
+def score_to_musicxml_bytes(score):
+    """Serializes a music21 Score to MusicXML bytes without touching the disk."""
+    return GeneralObjectExporter(score).parse()
+
+def score_to_midi_bytes(score):
+    """Serializes a music21 Score to Standard MIDI File bytes without touching the disk."""
+    midi_file = midi.translate.streamToMidiFile(score)
+    return midi_file.writestr()
+
+def get_output_paths(filename):
     """
-    Generates a PDF file from a music21 Score using MuseScore.
-    Works on both Windows and Linux.
-    Creates an output folder with the piece name.
+    Returns the paths of all files exported for a piece and creates its output folder.
+    Keys: 'dir', 'musicxml', 'midi', 'pdf', 'mp3'.
     """
-    # Create output directory
     output_dir = os.path.join("output", filename)
     os.makedirs(output_dir, exist_ok=True)
-    
-    xml_file = os.path.join(output_dir, f"{filename}.musicxml")
-    pdf_file = os.path.join(output_dir, f"{filename}.pdf")
-
-    # Save MusicXML
-    score.write('musicxml', fp=xml_file)
-    print(f"MusicXML saved: {xml_file}")
+    return {
+        'dir': output_dir,
+        'musicxml': os.path.join(output_dir, f"{filename}.musicxml"),
+        'midi': os.path.join(output_dir, f"{filename}.mid"),
+        'pdf': os.path.join(output_dir, f"{filename}.pdf"),
+        'mp3': os.path.join(output_dir, f"{filename}.mp3"),
+    }
 
-    # Different MuseScore paths depending on operating system
+def get_musescore_commands(for_audio=False):
+    """Different MuseScore paths depending on operating system."""
     if platform.system() == "Windows":
-        musescore_commands = [
+        if for_audio:
+            return [
+                'MuseScore3.exe', 'MuseScore4.exe', 'mscore.exe',
+                r'C:\Program Files\MuseScore 3\bin\MuseScore3.exe',
+                r'C:\Program Files\MuseScore 4\bin\MuseScore4.exe'
+            ]
+        return [
             'MuseScore3.exe',
-            'MuseScore4.exe', 
+            'MuseScore4.exe',
             'mscore.exe',
             r'C:\Program Files\MuseScore 3\bin\MuseScore3.exe',
             r'C:\Program Files\MuseScore 4\bin\MuseScore4.exe',
             r'C:\Program Files (x86)\MuseScore 3\bin\MuseScore3.exe',
             r'C:\Program Files (x86)\MuseScore 4\bin\MuseScore4.exe'
         ]
-    else:  # Linux/Unix/macOS
-        musescore_commands = [
-            'musescore',
-            'mscore',
-            'MuseScore',
-            '/usr/bin/musescore',
-            '/usr/local/bin/musescore',
-            '/snap/bin/musescore',
-            '/opt/musescore/bin/musescore'
-        ]
-    
-    for cmd in musescore_commands:
+    # Linux/Unix/macOS
+    if for_audio:
+        return ['musescore', 'mscore', '/usr/bin/musescore']
+    return [
+        'musescore',
+        'mscore',
+        'MuseScore',
+        '/usr/bin/musescore',
+        '/usr/local/bin/musescore',
+        '/snap/bin/musescore',
+        '/opt/musescore/bin/musescore'
+    ]
+
+def convert_with_musescore(input_file, output_file, for_audio=False):
+    """
+    Converts a file with the first MuseScore installation that works.
+    Returns True on success, False if no MuseScore could do the conversion.
+    """
+    for cmd in get_musescore_commands(for_audio):
         try:
-            subprocess.run([cmd, '-o', pdf_file, xml_file], check=True)
-            print(f"PDF generated with MuseScore: {pdf_file}")
-            return
+            subprocess.run([cmd, '-o', output_file, input_file], check=True)
+            return True
         except (subprocess.CalledProcessError, FileNotFoundError):
             continue
-            
-    # If MuseScore was not found
+    return False
+
+def print_musescore_install_help(xml_file):
     print("MuseScore not found!")
     if platform.system() == "Windows":
         print("Please install MuseScore from: https://musescore.org/")
@@ -62,67 +85,76 @@ def generate_pdf_with_title(score, filename="aleatory_music"):
     print("Or open the MusicXML file manually in MuseScore:")
     print(f"  {os.path.abspath(xml_file)}")
 
+def print_mp3_install_help(midi_file):
+    print("MP3 conversion failed!")
+    print("Install one of the following options:")
+    if platform.system() == "Windows":
+        print("  - MuseScore (https://musescore.org/)")
+        print("  - FluidSynth + FFmpeg")
+    else:
+        print("  - Ubuntu/Debian: sudo apt install fluidsynth fluid-soundfont-gm ffmpeg")
+        print("  - Ubuntu/Debian: sudo apt install timidity ffmpeg")
+        print("  - Fedora: sudo dnf install fluidsynth soundfont2-default ffmpeg")
+    print(f"MIDI file available: {os.path.abspath(midi_file)}")
+
+def generate_pdf_with_title(score, filename="aleatory_music"):
+    """
+    Generates a PDF file from a music21 Score using MuseScore.
+    Works on both Windows and Linux.
+    Creates an output folder with the piece name.
+    Returns the PDF path, or None if MuseScore was not found.
+    """
+    # Create output directory
+    paths = get_output_paths(filename)
+    xml_file = paths['musicxml']
+    pdf_file = paths['pdf']
+
+    # Save MusicXML
+    score.write('musicxml', fp=xml_file)
+    print(f"MusicXML saved: {xml_file}")
+
+    if convert_with_musescore(xml_file, pdf_file):
+        print(f"PDF generated with MuseScore: {pdf_file}")
+        return pdf_file
+
+    print_musescore_install_help(xml_file)
+    return None
+
 def generate_mp3_from_score(score, filename="aleatory_music"):
     """
     Generates an MP3 file from a music21 Score.
     Uses different methods depending on available software.
     Creates an output folder with the piece name.
+    Returns the MP3 path, or None if the conversion failed.
     """
     # Create output directory
-    output_dir = os.path.join("output", filename)
-    os.makedirs(output_dir, exist_ok=True)
-    
-    midi_file = os.path.join(output_dir, f"{filename}.mid")
-    mp3_file = os.path.join(output_dir, f"{filename}.mp3")
-    
+    paths = get_output_paths(filename)
+    midi_file = paths['midi']
+    mp3_file = paths['mp3']
+
     try:
         # Save as MIDI
         score.write('midi', fp=midi_file)
         print(f"MIDI saved: {midi_file}")
-    
-        conversion_successful = False
-        
-        if not conversion_successful:
-            if platform.system() == "Windows":
-                musescore_commands = [
-                    'MuseScore3.exe', 'MuseScore4.exe', 'mscore.exe',
-                    r'C:\Program Files\MuseScore 3\bin\MuseScore3.exe',
-                    r'C:\Program Files\MuseScore 4\bin\MuseScore4.exe'
-                ]
-            else:
-                musescore_commands = ['musescore', 'mscore', '/usr/bin/musescore']
-            
-            for cmd in musescore_commands:
-                try:
-                    subprocess.run([cmd, '-o', mp3_file, midi_file], check=True)
-                    print(f"MP3 generated with MuseScore: {mp3_file}")
-                    conversion_successful = True
-                    break
-                except (subprocess.CalledProcessError, FileNotFoundError):
-                    continue
-        
-        if not conversion_successful:
-            print("MP3 conversion failed!")
-            print("Install one of the following options:")
-            if platform.system() == "Windows":
-                print("  - MuseScore (https://musescore.org/)")
-                print("  - FluidSynth + FFmpeg")
-            else:
-                print("  - Ubuntu/Debian: sudo apt install fluidsynth fluid-soundfont-gm ffmpeg")
-                print("  - Ubuntu/Debian: sudo apt install timidity ffmpeg")
-                print("  - Fedora: sudo dnf install fluidsynth soundfont2-default ffmpeg")
-            print(f"MIDI file available: {os.path.abspath(midi_file)}")
-            
+
+        if convert_with_musescore(midi_file, mp3_file, for_audio=True):
+            print(f"MP3 generated with MuseScore: {mp3_file}")
+            return mp3_file
+
+        print_mp3_install_help(midi_file)
     except Exception as e:
         print(f"Error generating MP3: {e}")
+    return None
 
 def generate_pdf_and_mp3(score, filename="aleatory_music"):
     """
     Generates both PDF and MP3 from a music21 Score.
     All files are saved in an output folder named after the piece.
+    Returns (pdf_file, mp3_file); an entry is None if that conversion failed.
     """
     output_dir = os.path.join("output", filename)
     print(f"Generating PDF and MP3 for: {filename}")
     print(f"Output directory: {os.path.abspath(output_dir)}")
-    generate_pdf_with_title(score, filename)
-    generate_mp3_from_score(score, filename)
+    pdf_file = generate_pdf_with_title(score, filename)
+    mp3_file = generate_mp3_from_score(score, filename)
+    return pdf_file, mp3_file
@@ -0,0 +1,234 @@
+import argparse
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+from music21 import chord, dynamics, note, pitch
+
+# Dynamic markings counted per score (column dyn_<name>)
+DYNAMIC_NAMES = ["ppp", "pp", "p", "mp", "mf", "f", "ff", "fff"]
+# Sounding events are counted by size: 1 = single note, 2..MAX = chords
+MAX_CHORD_SIZE = 10
+
+# Column name -> dtype of one feature vector
+FEATURE_COLUMNS = {
+    "seed": np.int64,  # -1 when the score was not generated from a seed
+    "num_parts": np.int16,
+    "num_measures": np.int32,
+    "num_notes": np.int32,
+    "num_chords": np.int32,
+    "num_rests": np.int32,
+    "total_quarter_length": np.float32,
+    "note_density": np.float32,  # Sounding events per measure and part
+    "rest_ratio": np.float32,  # Share of the duration that is rests
+    "pitch_min": np.int16,
+    "pitch_max": np.int16,
+    "pitch_mean": np.float32,
+    "range_usage": np.float32,  # Mean share of each instrument's range that was used
+}
+FEATURE_COLUMNS.update({f"dyn_{name}": np.int32 for name in DYNAMIC_NAMES})
+FEATURE_COLUMNS.update({f"chord_size_{size}": np.int32 for size in range(1, MAX_CHORD_SIZE + 1)})
+
+
+def extract_score_features(score, ensemble, seed=None):
+    """Compute the feature vector of a generated score in a single pass over its parts."""
+    features = {name: 0 for name in FEATURE_COLUMNS}
+    features["seed"] = -1 if seed is None else seed
+    features["ensemble"] = ensemble.name
+
+    instrument_ranges = {
+        instr.name: (pitch.Pitch(instr.range_low).midi, pitch.Pitch(instr.range_high).midi)
+        for instr in ensemble.instruments
+    }
+    # Grand staff instruments have two parts with the same name; their pitches are combined
+    used_ranges = {}
+    pitch_sum = 0
+    pitch_count = 0
+    rest_length = 0.0
+    pitch_min = 127
+    pitch_max = 0
+
+    parts = list(score.parts)
+    features["num_parts"] = len(parts)
+    for part in parts:
+        measures = part.getElementsByClass("Measure")
+        features["num_measures"] = max(features["num_measures"], len(measures))
+        low, high = used_ranges.get(part.partName, (127, 0))
+
+        for element in part.recurse():
+            if isinstance(element, note.Rest):
+                features["num_rests"] += 1
+                rest_length += float(element.quarterLength)
+            elif isinstance(element, (note.Note, chord.Chord)):
+                midis = [p.midi for p in element.pitches]
+                if isinstance(element, chord.Chord):
+                    features["num_chords"] += 1
+                else:
+                    features["num_notes"] += 1
+                features[f"chord_size_{min(len(midis), MAX_CHORD_SIZE)}"] += 1
+                pitch_sum += sum(midis)
+                pitch_count += len(midis)
+                low = min(low, min(midis))
+                high = max(high, max(midis))
+            elif isinstance(element, dynamics.Dynamic):
+                if element.value in DYNAMIC_NAMES:
+                    features[f"dyn_{element.value}"] += 1
+
+        used_ranges[part.partName] = (low, high)
+        pitch_min = min(pitch_min, low)
+        pitch_max = max(pitch_max, high)
+
+    total_length = float(score.highestTime) * max(len(parts), 1)
+    events = features["num_notes"] + features["num_chords"]
+    features["total_quarter_length"] = float(score.highestTime)
+    features["note_density"] = events / max(features["num_measures"] * len(parts), 1)
+    features["rest_ratio"] = rest_length / total_length if total_length else 0.0
+    features["pitch_min"] = pitch_min if pitch_count else -1
+    features["pitch_max"] = pitch_max if pitch_count else -1
+    features["pitch_mean"] = pitch_sum / pitch_count if pitch_count else 0.0
+
+    usages = []
+    for name, (low, high) in used_ranges.items():
+        if name in instrument_ranges and low <= high:
+            range_low, range_high = instrument_ranges[name]
+            usages.append((high - low) / max(range_high - range_low, 1))
+    features["range_usage"] = sum(usages) / len(usages) if usages else 0.0
+    return features
+
+
+class FeatureBatchWriter:
+    """
+    Collects feature vectors in memory and appends them to a columnar store:
+    one uncompressed .npz per batch with one array per feature column.
+    """
+
+    def __init__(self, directory="output/features", batch_size=10000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self._rows = []
+        self._batch_number = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+    def add(self, features):
+        """Append one feature vector; writes a batch file once batch_size rows are buffered."""
+        with self._lock:
+            self._rows.append(features)
+            if len(self._rows) >= self.batch_size:
+                self._write_batch()
+
+    def flush(self):
+        """Write any buffered rows."""
+        with self._lock:
+            if self._rows:
+                self._write_batch()
+
+    def _write_batch(self):
+        columns = {name: np.array([row[name] for row in self._rows], dtype=dtype)
+                   for name, dtype in FEATURE_COLUMNS.items()}
+        columns["ensemble"] = np.array([row["ensemble"] for row in self._rows], dtype=str)
+
+        # Unique per process so parallel writers never collide
+        filename = f"batch-{time.time_ns()}-{os.getpid()}-{self._batch_number:05d}.npz"
+        path = os.path.join(self.directory, filename)
+        np.savez(path, **columns)
+        print(f"Feature batch saved: {path} ({len(self._rows)} scores)")
+        self._batch_number += 1
+        self._rows = []
+
+
+def load_feature_store(directory="output/features"):
+    """Load and concatenate all batch files of a feature store into one array per column."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.npz")))
+    if not paths:
+        raise FileNotFoundError(f"No feature batches found in {directory}")
+
+    batches = {}
+    for path in paths:
+        with np.load(path) as batch:
+            for name in batch.files:
+                batches.setdefault(name, []).append(batch[name])
+    return {name: np.concatenate(arrays) for name, arrays in batches.items()}
+
+
+def feature_report(columns, ensemble=None):
+    """Aggregate statistics over all scores in the store (optionally one ensemble only)."""
+    if ensemble is not None:
+        selection = columns["ensemble"] == ensemble
+        columns = {name: values[selection] for name, values in columns.items()}
+
+    count = len(columns["num_parts"])
+    report = {"scores": count}
+    if count == 0:
+        return report
+
+    summary = {}
+    for name in ["num_measures", "note_density", "rest_ratio", "pitch_min", "pitch_max", "pitch_mean", "range_usage"]:
+        values = columns[name].astype(np.float64)
+        summary[name] = {
+            "mean": float(values.mean()),
+            "min": float(values.min()),
+            "p5": float(np.percentile(values, 5)),
+            "p95": float(np.percentile(values, 95)),
+            "max": float(values.max()),
+        }
+    report["features"] = summary
+
+    dynamic_counts = np.array([columns[f"dyn_{name}"].sum() for name in DYNAMIC_NAMES], dtype=np.float64)
+    report["dynamics"] = dict(zip(DYNAMIC_NAMES, (dynamic_counts / max(dynamic_counts.sum(), 1)).round(4).tolist()))
+
+    size_counts = np.array([columns[f"chord_size_{size}"].sum() for size in range(1, MAX_CHORD_SIZE + 1)],
+                           dtype=np.float64)
+    report["event_sizes"] = dict(zip(range(1, MAX_CHORD_SIZE + 1),
+                                     (size_counts / max(size_counts.sum(), 1)).round(4).tolist()))
+
+    names, counts = np.unique(columns["ensemble"], return_counts=True)
+    report["ensembles"] = dict(zip(names.tolist(), counts.tolist()))
+    return report
+
+
+def print_feature_report(report):
+    print(f"Scores: {report['scores']}")
+    if not report["scores"]:
+        return
+    print("\nEnsembles:")
+    for name, count in report["ensembles"].items():
+        print(f"  {name}: {count}")
+    print("\nFeatures (mean / min / p5 / p95 / max):")
+    for name, stats in report["features"].items():
+        print(f"  {name:<14} {stats['mean']:8.2f} {stats['min']:8.2f} {stats['p5']:8.2f} "
+              f"{stats['p95']:8.2f} {stats['max']:8.2f}")
+    print("\nDynamics distribution:")
+    for name, share in report["dynamics"].items():
+        print(f"  {name:<4} {share:6.1%}")
+    print("\nNotes per event (1 = single note, more = chord):")
+    for size, share in report["event_sizes"].items():
+        if share:
+            print(f"  {size:<4} {share:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate statistics over a generated corpus.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="Print aggregate statistics of a feature store")
+    report_parser.add_argument("directory", nargs="?", default="output/features")
+    report_parser.add_argument("--ensemble", default=None, help="Only include scores of this ensemble")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        start = time.perf_counter()
+        report = feature_report(load_feature_store(args.directory), args.ensemble)
+        print_feature_report(report)
+        print(f"\nReport computed in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,34 @@
 from music21 import *
 from music21 import clef, pitch, note, chord, articulations, instrument, stream, metadata, meter, dynamics, layout
 from difflib import get_close_matches
-from .custom_random import get_random_number
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from .custom_random import get_random_number, configure_random_generator, use_random_generator, spawn_random_substreams
 from .config_parser import parse_config, MusicConfig
+from .score_features import extract_score_features
+from .form import MotifLibrary, plan_sections
+from .harmony import HarmonyFilter, pc_mask
+from .score_archive import encode_score, decode_parts
+
+# Relative weight of notes outside an instrument's tessitura
+OUTSIDE_TESSITURA_WEIGHT = 0.25
+# Integer resolution of candidate weights, so one integer draw selects a pitch
+WEIGHT_RESOLUTION = 1000
 
 class StochasticComposer:
     def __init__(self, config_path="config/config.xml"):
+        self.config_path = config_path
         self.config = parse_config(config_path)
+        configure_random_generator(self.config.capture)
+        # Chord restrictions from the <harmony> element (None = any pitch collection)
+        self.harmony = HarmonyFilter.from_settings(self.config.harmony) if self.config.harmony else None
+        # Optional score_features.FeatureBatchWriter that receives a feature vector per score
+        self.feature_writer = None
+        # Melodic constraint state: candidate arrays per instrument and last pitch per part
+        self._pitch_candidates = {}
+        self._last_pitches = {}
+        # MIDI number -> note name, spelled once
+        self._note_names = {}
         # ...existing instrument_mapping code...
         self.instrument_mapping = {
             # Strings - English primary, German secondary for compatibility
@@ -79,6 +101,13 @@ class StochasticComposer:
             "bariton": instrument.Baritone, # German compatibility
         }
     
+    def reload_config(self):
+        """Re-read the XML configuration this composer was created with."""
+        self.config = parse_config(self.config_path)
+        configure_random_generator(self.config.capture)
+        self.harmony = HarmonyFilter.from_settings(self.config.harmony) if self.config.harmony else None
+        self._pitch_candidates = {}
+    
     def get_clef_from_name(self, clef_name):
         """Convert clef name to music21 clef object."""
         if clef_name == "treble":
@@ -126,11 +155,15 @@ class StochasticComposer:
     
     def midi_to_note_name(self, midi_num):
         """Convert MIDI number to note name."""
-        try:
-            n = note.Note(midi=midi_num)
-            return n.nameWithOctave
-        except:
-            return "C4"
+        name = self._note_names.get(midi_num)
+        if name is None:
+            try:
+                n = note.Note(midi=midi_num)
+                name = n.nameWithOctave
+            except:
+                name = "C4"
+            self._note_names[midi_num] = name
+        return name
     
     def get_random_note_in_range(self, range_low, range_high):
         """Generate a random note within the instrument's range."""
@@ -140,6 +173,101 @@ class StochasticComposer:
         random_midi = get_random_number(low_midi, high_midi)
         return self.midi_to_note_name(random_midi)
     
+    def has_melodic_constraints(self, instr):
+        """Whether the instrument restricts leaps, prefers a step size or has a tessitura."""
+        return (instr.max_leap is not None or instr.preferred_step is not None
+                or instr.tessitura_low is not None)
+    
+    def _get_pitch_candidates(self, instr):
+        """Candidate MIDI numbers of an instrument and their base weights (tessitura), cached."""
+        cached = self._pitch_candidates.get(id(instr))
+        if cached is None:
+            low_midi = self.note_name_to_midi(instr.range_low)
+            high_midi = self.note_name_to_midi(instr.range_high)
+            candidates = np.arange(low_midi, high_midi + 1)
+            base_weights = np.ones(len(candidates))
+            if instr.tessitura_low is not None:
+                tessitura_low = self.note_name_to_midi(instr.tessitura_low)
+                tessitura_high = self.note_name_to_midi(instr.tessitura_high)
+                outside = (candidates < tessitura_low) | (candidates > tessitura_high)
+                base_weights[outside] = OUTSIDE_TESSITURA_WEIGHT
+            cached = self._pitch_candidates[id(instr)] = (candidates, base_weights)
+        return cached
+    
+    def get_pitch_weights(self, instr, previous_midi=None):
+        """
+        Build the candidate pitches and their integer weights for the next note: leaps larger
+        than max_leap are masked out and intervals near preferred_step are favoured.
+        """
+        candidates, weights = self._get_pitch_candidates(instr)
+        weights = weights.copy()
+        
+        if previous_midi is not None:
+            intervals = np.abs(candidates - previous_midi)
+            if instr.preferred_step is not None:
+                weights /= 1.0 + np.abs(intervals - instr.preferred_step)
+            if instr.max_leap is not None:
+                weights[intervals > instr.max_leap] = 0.0
+        
+        if not weights.any():
+            # Nothing reachable (e.g. a leap constraint narrower than the range allows)
+            weights = np.ones(len(candidates))
+        
+        # Integer weights; every allowed candidate keeps at least weight 1
+        int_weights = np.round(weights / weights.max() * WEIGHT_RESOLUTION).astype(np.int64)
+        int_weights = np.maximum(int_weights, weights > 0)
+        return candidates, int_weights
+    
+    def sample_weighted_pitch(self, candidates, int_weights):
+        """Pick one candidate with a single random draw over the cumulative weights."""
+        cumulative = np.cumsum(int_weights)
+        draw = get_random_number(0, int(cumulative[-1]) - 1)
+        return int(candidates[np.searchsorted(cumulative, draw, side='right')])
+    
+    def sample_harmonic_chord(self, candidates, int_weights, num_notes):
+        """
+        Pick up to num_notes distinct pitches, one draw each, keeping the pitch-class set of the
+        chord allowed by the harmony filter after every note. Falls back to unfiltered pitches
+        when no single candidate is allowed (e.g. a scale that misses the instrument's range).
+        """
+        pitch_classes = candidates % 12
+        weights = int_weights.copy()
+        midis = []
+        mask = 0
+        for _ in range(num_notes):
+            allowed_weights = self.harmony.filter_weights(mask, pitch_classes, weights)
+            if not allowed_weights.any():
+                break
+            midi = self.sample_weighted_pitch(candidates, allowed_weights)
+            midis.append(midi)
+            mask |= 1 << (midi % 12)
+            weights[midi - candidates[0]] = 0  # No unison doubling
+        
+        if not midis:
+            midis = [self.sample_weighted_pitch(candidates, int_weights) for _ in range(num_notes)]
+        return midis
+    
+    def get_random_notes_for_instrument(self, instr, num_notes=1):
+        """
+        Generate num_notes note names for one note or chord of an instrument, following
+        its melodic constraints relative to the previous note of the part if it has any.
+        Chords are restricted to the configured harmony if there is one.
+        """
+        constrained = self.has_melodic_constraints(instr)
+        harmonic = num_notes > 1 and self.harmony is not None
+        if not constrained and not harmonic:
+            return [self.get_random_note_in_range(instr.range_low, instr.range_high) for _ in range(num_notes)]
+        
+        # All chord tones are measured against the same previous note; the top one continues the line
+        candidates, int_weights = self.get_pitch_weights(instr, self._last_pitches.get(id(instr)))
+        if harmonic:
+            midis = self.sample_harmonic_chord(candidates, int_weights, num_notes)
+        else:
+            midis = [self.sample_weighted_pitch(candidates, int_weights) for _ in range(num_notes)]
+        if constrained:
+            self._last_pitches[id(instr)] = max(midis)
+        return [self.midi_to_note_name(midi) for midi in midis]
+    
     def get_random_rhythm(self):
         """Get a random rhythm from config."""
         rhythm_idx = get_random_number(0, len(self.config.rhythms) - 1)
@@ -293,7 +421,7 @@ class StochasticComposer:
                 
                 if num_notes == 1:
                     # Single note
-                    note_name = self.get_random_note_in_range(instr.range_low, instr.range_high)
+                    note_name = self.get_random_notes_for_instrument(instr)[0]
                     n = note.Note(note_name, quarterLength=rhythm)
                     
                     # Add random articulation
@@ -303,10 +431,7 @@ class StochasticComposer:
                     measure.append(n)
                 else:
                     # Chord
-                    chord_notes = []
-                    for _ in range(num_notes):
-                        note_name = self.get_random_note_in_range(instr.range_low, instr.range_high)
-                        chord_notes.append(note_name)
+                    chord_notes = self.get_random_notes_for_instrument(instr, num_notes)
                     
                     c = chord.Chord(chord_notes, quarterLength=rhythm)
                     
@@ -346,10 +471,7 @@ class StochasticComposer:
                 num_notes = get_random_number(1, max_notes)
                 
                 # Generate all notes first
-                all_notes = []
-                for _ in range(num_notes):
-                    note_name = self.get_random_note_in_range(instr.range_low, instr.range_high)
-                    all_notes.append(note_name)
+                all_notes = self.get_random_notes_for_instrument(instr, num_notes)
                 
                 # Separate notes by clef
                 treble_notes = []
@@ -404,18 +526,232 @@ class StochasticComposer:
         
         return treble_measure, bass_measure
     
-    def create_random_score(self, ensemble_name="Piano Solo", num_measures=None, title="Aleatoric Music"):
-        """Create a complete random score using the specified ensemble."""
+    def create_measure_group(self, instr, grand_staff=False):
+        """Create one measure of a part: (measure,) or (treble_measure, bass_measure) for grand staff instruments."""
+        if grand_staff:
+            measures = self.create_random_grand_staff_measure(instr)
+        else:
+            measures = (self.create_random_measure(instr),)
+        
+        # Occasionally add new dynamics
+        if get_random_number(1, 100) <= 20:  # 20% chance
+            new_dynamic = self.get_random_dynamic()
+            for measure in measures:
+                measure.insert(0, dynamics.Dynamic(new_dynamic))
+        return measures
+    
+    def generate_part_measures(self, instr, num_measures, grand_staff=False):
+        """Generate the measure groups of a part, following the config's form plan if there is one."""
+        form = self.config.form
+        if form is None:
+            return [self.create_measure_group(instr, grand_staff) for _ in range(num_measures)]
+        
+        library = MotifLibrary(form.cache_size)
+        groups = []
+        for letter, length in plan_sections(form.plan, num_measures):
+            if length == 0:
+                continue
+            material = library.get(letter)
+            if material is None:
+                section = [self.create_measure_group(instr, grand_staff) for _ in range(length)]
+                library.put(letter, section)
+            else:
+                section = self.restate_section(instr, material[:length], form)
+                if section is None:
+                    # No transposition fits the melodic line, so the section is composed again
+                    section = []
+                # A restatement longer than the original continues with new material
+                section += [self.create_measure_group(instr, grand_staff) for _ in range(length - len(section))]
+            groups.extend(section)
+        return groups
+    
+    def first_sounding_pitches(self, section):
+        """MIDI numbers of the first note or chord of a section (all staves of a grand staff group)."""
+        for group in section:
+            onsets = [(n.offset, p.midi) for measure in group for n in measure.notes for p in n.pitches]
+            if onsets:
+                first_offset = min(offset for offset, _ in onsets)
+                return [midi for offset, midi in onsets if offset == first_offset]
+        return []
+    
+    def choose_transposition(self, instr, section, max_shift):
+        """
+        Random transposition of at most max_shift semitones that keeps the section in range and,
+        if the instrument has a max_leap, keeps its first note within max_leap of the previous
+        note of the part. With a harmony filter, only shifts that keep every chord of the section
+        allowed qualify. Returns None when no transposition (not even 0) qualifies.
+        """
+        midis = [p.midi for group in section for measure in group for n in measure.notes for p in n.pitches]
+        if not midis:
+            return 0
+        
+        max_shift = max(max_shift, 0)
+        lowest_shift = max(-max_shift, self.note_name_to_midi(instr.range_low) - min(midis))
+        highest_shift = min(max_shift, self.note_name_to_midi(instr.range_high) - max(midis))
+        
+        previous_midi = self._last_pitches.get(id(instr))
+        if instr.max_leap is not None and previous_midi is not None:
+            first = self.first_sounding_pitches(section)
+            lowest_shift = max(lowest_shift, previous_midi - instr.max_leap - min(first))
+            highest_shift = min(highest_shift, previous_midi + instr.max_leap - max(first))
+        
+        if lowest_shift > highest_shift:
+            return None
+        
+        if self.harmony is not None:
+            chord_masks = [pc_mask(p.midi for p in n.pitches)
+                           for group in section for measure in group for n in measure.notes if len(n.pitches) > 1]
+            if chord_masks:
+                shifts = self.harmony.allowed_shifts(chord_masks, range(lowest_shift, highest_shift + 1))
+                if not shifts:
+                    return None
+                if len(shifts) == 1:
+                    return shifts[0]
+                return shifts[get_random_number(0, len(shifts) - 1)]
+        
+        if lowest_shift == highest_shift:
+            return lowest_shift
+        return get_random_number(lowest_shift, highest_shift)
+    
+    def clone_measure(self, measure, shift=0):
+        """Rebuild a generated measure shifted by shift semitones; much cheaper than deepcopy or transpose."""
+        clone = stream.Measure()
+        for element in measure:
+            if isinstance(element, note.Rest):
+                new_element = note.Rest(quarterLength=element.quarterLength)
+            elif isinstance(element, chord.Chord):
+                new_element = chord.Chord([self.midi_to_note_name(p.midi + shift) for p in element.pitches],
+                                          quarterLength=element.quarterLength)
+                for articulation in element.articulations:
+                    new_element.articulations.append(type(articulation)())
+            elif isinstance(element, note.Note):
+                new_element = note.Note(self.midi_to_note_name(element.pitch.midi + shift),
+                                        quarterLength=element.quarterLength)
+                for articulation in element.articulations:
+                    new_element.articulations.append(type(articulation)())
+            elif isinstance(element, dynamics.Dynamic):
+                new_element = dynamics.Dynamic(element.value)
+            else:
+                continue
+            clone.insert(element.offset, new_element)
+        return clone
+    
+    def restate_section(self, instr, section, form):
+        """
+        Clone a generated section, possibly transposed and with new dynamics, instead of composing it again.
+        Returns None if no transposition keeps the section within the melodic constraints.
+        """
+        shift = self.choose_transposition(instr, section, form.transpose)
+        if shift is None:
+            return None
+        restated = [tuple(self.clone_measure(measure, shift) for measure in group) for group in section]
+        
+        if form.vary_dynamics:
+            for group in restated:
+                # Grand staff measures carry the same dynamics; change them together
+                marks = [list(measure.getElementsByClass(dynamics.Dynamic)) for measure in group]
+                for position in range(len(marks[0])):
+                    new_dynamic = self.get_random_dynamic()
+                    for measure_marks in marks:
+                        measure_marks[position].value = new_dynamic
+            
+            # Mark the restatement with a new dynamic level if it does not start with one
+            first_group = restated[0]
+            if not any(d.offset == 0 for d in first_group[0].getElementsByClass(dynamics.Dynamic)):
+                new_dynamic = self.get_random_dynamic()
+                for measure in first_group:
+                    measure.insert(0, dynamics.Dynamic(new_dynamic))
+        
+        # Continue the melodic line from the end of the restatement
+        if self.has_melodic_constraints(instr):
+            last_notes = [n for measure in restated[-1] for n in measure.notes]
+            if last_notes:
+                self._last_pitches[id(instr)] = max(p.midi for p in last_notes[-1].pitches)
+        return restated
+    
+    def create_instrument_parts(self, instr, num_measures, time_signature='4/4'):
+        """Create the part(s) for one instrument: one part, or treble and bass parts for grand staff instruments."""
+        clef_obj = self.get_clef_from_name(instr.clef)
+        # A new part starts without a previous note
+        self._last_pitches.pop(id(instr), None)
+        
+        if isinstance(clef_obj, list):  # Grand staff instrument (piano, harp)
+            # Create two separate parts for treble and bass - much simpler approach
+            # music21 will automatically group them as a grand staff when they have the same instrument
+            
+            # Treble clef part (right hand)
+            treble_part = stream.Part()
+            treble_part.partName = f"{instr.name}"
+            treble_part.id = f"{instr.name}_treble"
+            music21_instr = self.get_music21_instrument(instr.name)
+            treble_part.insert(0, music21_instr)
+            treble_part.insert(0, clef.TrebleClef())
+            treble_part.insert(0, meter.TimeSignature(time_signature))
+            initial_dynamic = self.get_random_dynamic()
+            treble_part.insert(0, dynamics.Dynamic(initial_dynamic))
+            
+            # Bass clef part (left hand)
+            bass_part = stream.Part()
+            bass_part.partName = f"{instr.name}"
+            bass_part.id = f"{instr.name}_bass"
+            bass_part.insert(0, self.get_music21_instrument(instr.name))
+            bass_part.insert(0, clef.BassClef())
+            bass_part.insert(0, meter.TimeSignature(time_signature))
+            bass_part.insert(0, dynamics.Dynamic(initial_dynamic))
+            
+            # Generate measures for both parts
+            for treble_measure, bass_measure in self.generate_part_measures(instr, num_measures, grand_staff=True):
+                treble_part.append(treble_measure)
+                bass_part.append(bass_measure)
+            
+            return [treble_part, bass_part]
+        else:  # Single clef instrument
+            part = stream.Part()
+            part.partName = instr.name
+            music21_instr = self.get_music21_instrument(instr.name)
+            part.insert(0, music21_instr)
+            part.insert(0, clef_obj)
+            part.insert(0, meter.TimeSignature(time_signature))
+            initial_dynamic = self.get_random_dynamic()
+            part.insert(0, dynamics.Dynamic(initial_dynamic))
+            for (measure,) in self.generate_part_measures(instr, num_measures):
+                part.append(measure)
+            return [part]
+    
+    def _create_instrument_parts_from_stream(self, instr, num_measures, generator):
+        """Create an instrument's parts with all random draws taken from its own substream."""
+        with use_random_generator(generator):
+            return self.create_instrument_parts(instr, num_measures)
+    
+    def create_random_score(self, ensemble_name="Piano Solo", num_measures=None, title="Aleatoric Music",
+                            seed=None, max_workers=None, executor="thread"):
+        """
+        Create a complete random score using the specified ensemble.
+        With a seed (or max_workers) every instrument draws from its own random substream, so the
+        parts can be generated concurrently in a thread or process pool and the same seed always
+        gives the same score, however many workers are used.
+        """
         if ensemble_name not in self.config.ensembles:
             available = list(self.config.ensembles.keys())
             raise ValueError(f"Ensemble '{ensemble_name}' not found. Available: {available}")
         
+        ensemble = self.config.ensembles[ensemble_name]
+        use_substreams = seed is not None or max_workers is not None
+        if use_substreams:
+            if seed is None:
+                # Let the webcam pick the seed; the substreams derived from it are reproducible
+                seed = get_random_number(0, 2**32 - 1)
+            score_stream, *part_streams = spawn_random_substreams(seed, len(ensemble.instruments) + 1)
+        
         # Use config-based random measures if not specified
         if num_measures is None:
-            num_measures = self.get_random_measures_count()
+            if use_substreams:
+                with use_random_generator(score_stream):
+                    num_measures = self.get_random_measures_count()
+            else:
+                num_measures = self.get_random_measures_count()
             print(f"Using random measure count from config: {num_measures} measures (range: {self.config.num_measures_min}-{self.config.num_measures_max})")
         
-        ensemble = self.config.ensembles[ensemble_name]
         score = stream.Score()
         
         # Add metadata
@@ -423,75 +759,46 @@ class StochasticComposer:
         score.metadata.title = title
         score.metadata.composer = "Stochastic Music Generator"
         
-        # Add time signature
-        time_sig = meter.TimeSignature('4/4')
-        
         # Create parts for each instrument
-        for instr in ensemble.instruments:
-            clef_obj = self.get_clef_from_name(instr.clef)
+        if not use_substreams:
+            instrument_parts = [self.create_instrument_parts(instr, num_measures) for instr in ensemble.instruments]
+        elif max_workers is None or max_workers <= 1:
+            instrument_parts = [self._create_instrument_parts_from_stream(instr, num_measures, generator)
+                                for instr, generator in zip(ensemble.instruments, part_streams)]
+        elif executor == "process":
+            # Real parallelism for the pure-Python part generation; workers send back archive
+            # event records and the parts are rebuilt here
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                instrument_parts = [decode_parts(events, meta, self)
+                                    for events, meta in pool.map(_create_instrument_parts_in_process,
+                                                                 [self.config_path] * len(part_streams),
+                                                                 ensemble.instruments,
+                                                                 [num_measures] * len(part_streams),
+                                                                 part_streams)]
+        elif executor == "thread":
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                instrument_parts = list(pool.map(self._create_instrument_parts_from_stream,
+                                                 ensemble.instruments,
+                                                 [num_measures] * len(part_streams),
+                                                 part_streams))
+        else:
+            raise ValueError(f"Unknown executor '{executor}'. Use 'thread' or 'process'.")
+        
+        # Assemble in ensemble order
+        for instr, parts in zip(ensemble.instruments, instrument_parts):
+            for part in parts:
+                score.append(part)
             
-            if isinstance(clef_obj, list):  # Grand staff instrument (piano, harp)
-                # Create two separate parts for treble and bass - much simpler approach
-                # music21 will automatically group them as a grand staff when they have the same instrument
-                
-                # Treble clef part (right hand)
-                treble_part = stream.Part()
-                treble_part.partName = f"{instr.name}"
-                treble_part.id = f"{instr.name}_treble"
-                music21_instr = self.get_music21_instrument(instr.name)
-                treble_part.insert(0, music21_instr)
-                treble_part.insert(0, clef.TrebleClef())
-                treble_part.insert(0, time_sig)
-                initial_dynamic = self.get_random_dynamic()
-                treble_part.insert(0, dynamics.Dynamic(initial_dynamic))
-                
-                # Bass clef part (left hand)
-                bass_part = stream.Part()
-                bass_part.partName = f"{instr.name}"
-                bass_part.id = f"{instr.name}_bass"
-                bass_part.insert(0, self.get_music21_instrument(instr.name))
-                bass_part.insert(0, clef.BassClef())
-                bass_part.insert(0, time_sig)
-                bass_part.insert(0, dynamics.Dynamic(initial_dynamic))
-                
-                # Generate measures for both parts
-                for measure_num in range(num_measures):
-                    treble_measure, bass_measure = self.create_random_grand_staff_measure(instr)
-                    # Occasionally add new dynamics
-                    if get_random_number(1, 100) <= 20:  # 20% chance
-                        new_dynamic = self.get_random_dynamic()
-                        treble_measure.insert(0, dynamics.Dynamic(new_dynamic))
-                        bass_measure.insert(0, dynamics.Dynamic(new_dynamic))
-                    
-                    treble_part.append(treble_measure)
-                    bass_part.append(bass_measure)
-                
-                # Add both parts to score
-                score.append(treble_part)
-                score.append(bass_part)
-                
+            if len(parts) == 2:
                 # Create a staff group to explicitly indicate this is a grand staff (piano brace)
-                staff_group = layout.StaffGroup([treble_part, bass_part], 
+                staff_group = layout.StaffGroup(parts, 
                                                name=instr.name, 
                                                abbreviation=instr.name[:4], 
                                                symbol='brace')
                 score.insert(0, staff_group)
-            else:  # Single clef instrument
-                part = stream.Part()
-                part.partName = instr.name
-                music21_instr = self.get_music21_instrument(instr.name)
-                part.insert(0, music21_instr)
-                part.insert(0, clef_obj)
-                part.insert(0, time_sig)
-                initial_dynamic = self.get_random_dynamic()
-                part.insert(0, dynamics.Dynamic(initial_dynamic))
-                for measure_num in range(num_measures):
-                    measure = self.create_random_measure(instr)
-                    if get_random_number(1, 100) <= 20:  # 20% chance
-                        new_dynamic = self.get_random_dynamic()
-                        measure.insert(0, dynamics.Dynamic(new_dynamic))
-                    part.append(measure)
-                score.append(part)
+        
+        if self.feature_writer is not None:
+            self.feature_writer.add(extract_score_features(score, ensemble, seed))
         return score
 
     def get_clef(self, notenschluessel):
@@ -511,6 +818,22 @@ class StochasticComposer:
             # Default to treble clef
             return clef.TrebleClef()
     
+# One composer per worker process, reused across parts
+_process_composers = {}
+
+def _create_instrument_parts_in_process(config_path, instr, num_measures, generator):
+    """
+    Process pool entry point for StochasticComposer.create_random_score. Returns the parts
+    encoded as score_archive event records: pickled music21 streams do not come back intact.
+    """
+    composer = _process_composers.get(config_path)
+    if composer is None:
+        composer = _process_composers[config_path] = StochasticComposer(config_path)
+    score = stream.Score()
+    for part in composer._create_instrument_parts_from_stream(instr, num_measures, generator):
+        score.append(part)
+    return encode_score(score)
+
 def create_multi_voice_score(ensemble_name="String Trio", num_measures=None, title="Aleatoric Composition"):
     """Create a random multi-voice score using the stochastic composer."""
     composer = StochasticComposer()
@@ -0,0 +1,76 @@
+import pytest
+
+from aleatoric.harmony import (INTERVAL_VECTORS, PRIME_FORMS, mask_to_pcs, parse_scale, parse_set_class, pc_mask,
+                               prime_form_name)
+
+
+@pytest.mark.parametrize("pitch_classes, prime_form", [
+    ((0, 4, 7), "037"),  # Major triad
+    ((9, 0, 4), "037"),  # Minor triad
+    ((0, 4, 7, 10), "0258"),
+    ((0, 4, 7, 11), "0158"),
+    ((0, 3, 7, 10), "0358"),
+    ((0, 1, 4, 6), "0146"),
+    ((0, 1, 3, 7), "0137"),
+    ((0, 2, 4, 6, 8, 10), "02468t"),
+])
+def test_prime_forms(pitch_classes, prime_form):
+    assert prime_form_name(pc_mask(pitch_classes)) == prime_form
+
+
+@pytest.mark.parametrize("pitch_classes, interval_vector", [
+    ((0, 3, 7), [0, 0, 1, 1, 1, 0]),
+    ((0, 3, 6, 9), [0, 0, 4, 0, 0, 2]),
+    ((0, 2, 4, 6, 8, 10), [0, 6, 0, 6, 0, 3]),
+    ((0, 1, 4, 6), [1, 1, 1, 1, 1, 1]),
+])
+def test_interval_vectors(pitch_classes, interval_vector):
+    assert INTERVAL_VECTORS[pc_mask(pitch_classes)].tolist() == interval_vector
+
+
+def test_prime_forms_are_invariant_under_transposition_and_inversion():
+    for mask in range(1, 4096):
+        pcs = mask_to_pcs(mask)
+        assert PRIME_FORMS[pc_mask(pc + 5 for pc in pcs)] == PRIME_FORMS[mask]
+        assert PRIME_FORMS[pc_mask(-pc for pc in pcs)] == PRIME_FORMS[mask]
+        assert (INTERVAL_VECTORS[pc_mask(-pc for pc in pcs)] == INTERVAL_VECTORS[mask]).all()
+
+
+@pytest.mark.parametrize("spec, pitch_classes", [
+    ("037", (0, 3, 7)),
+    ("0,4,7", (0, 3, 7)),
+    ("0,10", (0, 2)),
+    ("0,4,11", (0, 1, 5)),
+    ("0 1 t", (0, 1, 3)),
+    ("0148", (0, 1, 4, 8)),
+    ("Triad", (0, 3, 7)),
+    ("dominant7", (0, 2, 5, 8)),
+])
+def test_parse_set_class(spec, pitch_classes):
+    assert parse_set_class(spec) == pc_mask(pitch_classes)
+
+
+@pytest.mark.parametrize("spec", ["0,45,7", "0,12", "0,4,", "", "03x", "cluster"])
+def test_parse_set_class_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_set_class(spec)
+
+
+@pytest.mark.parametrize("spec, pitch_classes", [
+    ("0,2,4,5,7,9,11", (0, 2, 4, 5, 7, 9, 11)),
+    ("0, 2, 4, t", (0, 2, 4, 10)),
+    ("024579e", (0, 2, 4, 5, 7, 9, 11)),
+    ("C major", (0, 2, 4, 5, 7, 9, 11)),
+    ("D dorian", (0, 2, 4, 5, 7, 9, 11)),
+    ("Bb major", (10, 0, 2, 3, 5, 7, 9)),
+    ("e minor", (4, 6, 7, 9, 11, 0, 2)),
+    ("E", (4, 6, 8, 9, 11, 1, 3)),
+])
+def test_parse_scale(spec, pitch_classes):
+    assert parse_scale(spec) == pc_mask(pitch_classes)
+
+
+@pytest.mark.parametrize("spec", ["0,2,13", "0,,2", "H major", "C bebop"])
+def test_parse_scale_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_scale(spec)
@@ -0,0 +1,21 @@
+import pytest
+
+from aleatoric.stochastic_composer import StochasticComposer
+
+from test_score_archive import CONFIG_PATH, score_content
+
+
+@pytest.fixture(scope="module")
+def composer():
+    return StochasticComposer(CONFIG_PATH)
+
+
+@pytest.mark.parametrize("ensemble", ["String Trio", "Piano Solo"])
+@pytest.mark.parametrize("seed", range(12))
+def test_executors_generate_the_same_score(composer, ensemble, seed):
+    serial = composer.create_random_score(ensemble, 8, seed=seed)
+    threaded = composer.create_random_score(ensemble, 8, seed=seed, max_workers=4, executor="thread")
+    processes = composer.create_random_score(ensemble, 8, seed=seed, max_workers=4, executor="process")
+
+    assert score_content(threaded) == score_content(serial)
+    assert score_content(processes) == score_content(serial)
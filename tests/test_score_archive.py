@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from music21 import chord, dynamics, note, stream
+
+from aleatoric.score_archive import ScoreArchive, ScoreArchiveWriter
+from aleatoric.stochastic_composer import StochasticComposer
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config", "config.xml")
+
+
+def score_content(score):
+    """Everything the archive stores, per part and measure, in a comparable form."""
+    content = []
+    for part in score.parts:
+        part_content = [part.partName, [(float(d.offset), d.value) for d in part.getElementsByClass(dynamics.Dynamic)]]
+        for measure_index, measure in enumerate(part.getElementsByClass(stream.Measure)):
+            for element in measure:
+                if isinstance(element, dynamics.Dynamic):
+                    item = ("dynamic", element.value)
+                elif isinstance(element, note.Rest):
+                    item = ("rest",)
+                elif isinstance(element, (note.Note, chord.Chord)):
+                    item = ("sound", sorted(p.midi for p in element.pitches),
+                            [a.name for a in element.articulations])
+                else:
+                    continue
+                part_content.append((measure_index, float(element.offset), float(element.quarterLength)) + item)
+        content.append(part_content)
+    return content
+
+
+def test_grand_staff_round_trip(tmp_path):
+    composer = StochasticComposer(CONFIG_PATH)
+    score = composer.create_random_score("Piano Solo", 6, "Round Trip", seed=7)
+    # Dynamics from config.xml are not limited to the standard markings
+    score.parts[0].getElementsByClass(stream.Measure)[1].insert(0, dynamics.Dynamic("sfz"))
+
+    with ScoreArchiveWriter(str(tmp_path), shard=1) as writer:
+        piece_id = writer.append_score(score, "Piano Solo", seed=7)
+
+    archive = ScoreArchive(str(tmp_path))
+    restored = archive.to_score(piece_id, composer)
+
+    assert len(restored.parts) == 2
+    assert archive.get_metadata(piece_id)["parts"][0]["group"] is not None
+    assert score_content(restored) == score_content(score)
+
+
+def test_shard_is_locked_by_its_writer(tmp_path):
+    with ScoreArchiveWriter(str(tmp_path)) as writer:
+        assert 0 <= writer.shard < 2**31
+        with pytest.raises(RuntimeError):
+            ScoreArchiveWriter(str(tmp_path), shard=writer.shard)
+        with ScoreArchiveWriter(str(tmp_path)) as other:
+            assert other.shard != writer.shard
+    # Released on close
+    ScoreArchiveWriter(str(tmp_path), shard=writer.shard).close()